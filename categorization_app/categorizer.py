@@ -1,13 +1,16 @@
 import streamlit as st
 import pandas as pd
+import os
 import re
 from io import BytesIO
 import zipfile
 import uuid
 import time
-
-# Master categorization file URL
-MASTER_SHEET_URL = "https://docs.google.com/spreadsheets/d/1I_Fz3slHP1mnfsKKgAFl54tKvqlo65Ug/export?format=xlsx"
+from shared.matcher_resource import get_matcher
+from shared.core import categorize_values, new_session_id, session_path
+from shared.categorize_stream import STREAM_THRESHOLD_BYTES, categorize_file, read_statement, sniff_format
+from shared.artifacts import download_button, zip_download_button
+from shared.pdf_cache import file_digest
 
 def run():
     # Custom CSS for styling the app
@@ -129,66 +132,58 @@ def run():
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.session_state["uploader_key"] = str(uuid.uuid4())
-        st.session_state["converted_df_for_categorization"] = None
+        st.session_state["converted_table_for_categorization"] = None
         st.session_state["just_reset"] = True
         st.rerun()
 
-    def clean_text(text):
-        return re.sub(r'\s+', ' ', str(text).lower().replace('–', '-').replace('—', '-')).strip()
-
-    def load_master_file():
+    def load_matcher():
+        # Process-wide compiled matcher shared by all sessions; keep only the reference
         try:
-            df = pd.read_excel(MASTER_SHEET_URL)
-            df['Key Word'] = df['Key Word'].astype(str).apply(clean_text)
-            return df
+            matcher = get_matcher()
         except Exception as e:
             st.error(f"⚠️ Error loading master file: {e}")
-            return pd.DataFrame()
+            return None
+        return matcher if matcher.categories else None
 
     def find_description_column(columns):
         possible = ['description', 'details', 'narration', 'particulars', 'transaction details', 'remarks']
         return next((col for col in columns if any(name in col.lower() for name in possible)), None)
 
-    def categorize_description(description, master_df):
-        cleaned = clean_text(description)
-        for _, row in master_df.iterrows():
-            if row['Key Word'] and row['Key Word'] in cleaned:
-                return row['Category']
-        return 'Uncategorized'
-
-    def categorize_statement(statement_df, master_df, desc_col):
-        statement_df['Categorization'] = statement_df[desc_col].apply(lambda x: categorize_description(x, master_df))
+    def categorize_statement(statement_df, matcher, desc_col):
+        statement_df['Categorization'] = pd.Categorical(categorize_values(statement_df[desc_col], matcher))
         return statement_df
 
     categorized_files = []
 
     if not just_reset:
-        if "converted_df_for_categorization" in st.session_state and st.session_state["converted_df_for_categorization"] is not None:
+        if st.session_state.get("converted_table_for_categorization") is not None:
             st.subheader("📥 Categorize Data from PDF Conversion")
             with st.spinner('🚀 Loading master file...'):
-                master_df = load_master_file()
+                matcher = load_matcher()
 
-            if not master_df.empty:
-                statement_df = st.session_state["converted_df_for_categorization"]
-                st.dataframe(statement_df.head(), use_container_width=True)
-                desc_col = find_description_column(statement_df.columns)
+            if matcher is not None:
+                from shared.interchange import categorize_table, description_column, to_frame
 
-                if desc_col:
-                    categorized = categorize_statement(statement_df, master_df, desc_col)
-                    st.success("✅ Data categorized successfully!")
-                    st.dataframe(categorized.head(), use_container_width=True)
+                # Typed Arrow table from the converter: the description column is already recorded
+                statement_table = st.session_state["converted_table_for_categorization"]
+                st.dataframe(to_frame(statement_table.slice(0, 5)), use_container_width=True)
 
-                    buffer = BytesIO()
-                    categorized.to_excel(buffer, index=False)
-                    buffer.seek(0)
-                    categorized_files.append(("Categorized_PDF_Output.xlsx", buffer))
-
-                    st.download_button(
-                        label="📥 Download Categorized Data",
-                        data=buffer,
-                        file_name="Categorized_PDF_Output.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                if description_column(statement_table):
+                    # Stays an Arrow table; only the preview rows and the export batches become pandas
+                    categorized = categorize_table(statement_table, matcher)
+                    st.success("✅ Data categorized successfully!")
+                    st.dataframe(to_frame(categorized.slice(0, 5)), use_container_width=True)
+
+                    # The converter kept these transactions in the store; they get their categories there
+                    # too, once per conversion and sheet version rather than on every rerun
+                    stored_key = (st.session_state.get("stored_digest"), matcher.version)
+                    if stored_key[0] is not None and st.session_state.get("categorized_stored") != stored_key:
+                        from shared.category_archive import categorize_stored
+                        categorize_stored(matcher)
+                        st.session_state["categorized_stored"] = stored_key
+
+                    categorized_files.append(("Categorized_PDF_Output.xlsx", categorized))
+                    download_button("📥 Download Categorized Data", categorized, "Categorized_PDF_Output.xlsx")
                 else:
                     st.error("⚠️ No description column found for categorization.")
             else:
@@ -204,55 +199,67 @@ def run():
 
     if not just_reset and uploaded_files:
         with st.spinner('🚀 Loading master file...'):
-            master_df = load_master_file()
+            matcher = load_matcher()
 
-        if master_df.empty:
+        if matcher is None:
             st.error("⚠️ Could not load the master file.")
         else:
             st.markdown('## 📑 Uploaded Files Preview & Results')
 
             for file in uploaded_files:
                 st.subheader(f"📄 {file.name}")
-                try:
-                    statement_df = pd.read_excel(file)
-                except Exception:
-                    statement_df = pd.read_csv(file)
+
+                # Big exports are categorized chunk by chunk straight into a file on disk
+                if file.size >= STREAM_THRESHOLD_BYTES:
+                    if "session_id" not in st.session_state:
+                        st.session_state["session_id"] = new_session_id()
+                    is_csv = sniff_format(file) == "csv"
+                    output_format = "csv" if is_csv else "xlsx"
+                    # Excel input (xls too) comes back as xlsx
+                    output_name = f"Categorized_{os.path.splitext(file.name)[0]}.{output_format}"
+                    # Named by upload and sheet version, so reruns (any click) reuse the finished file
+                    upload_id = getattr(file, "file_id", None) or file_digest(file)
+                    output_path = session_path(st.session_state["session_id"],
+                                               f"{upload_id}_{matcher.version[:16]}.{output_format}")
+                    categorized_rows = st.session_state.setdefault("categorized_rows", {})
+                    if not os.path.exists(output_path):
+                        try:
+                            with st.spinner(f"🚀 Categorizing {file.name} in chunks..."):
+                                categorized_rows[output_path] = categorize_file(file, matcher, output_path, output_format)
+                        except ValueError as e:
+                            st.error(f"⚠️ {e} ({file.name})")
+                            continue
+
+                    rows = categorized_rows.get(output_path)
+                    st.success(f"✅ {file.name} categorized successfully!" + (f" ({rows:,} rows)" if rows is not None else ""))
+                    with open(output_path, "rb") as output:
+                        st.download_button(
+                            label=f"📥 Download {file.name}",
+                            data=output,
+                            file_name=output_name,
+                            mime="text/csv" if is_csv else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        )
+                    categorized_files.append((output_name, output_path))
+                    continue
+
+                statement_df = read_statement(file)
 
                 st.dataframe(statement_df.head(), use_container_width=True)
                 desc_col = find_description_column(statement_df.columns)
 
                 if desc_col:
-                    categorized = categorize_statement(statement_df, master_df, desc_col)
+                    categorized = categorize_statement(statement_df, matcher, desc_col)
                     st.success(f"✅ {file.name} categorized successfully!")
                     st.dataframe(categorized.head(), use_container_width=True)
 
-                    buffer = BytesIO()
-                    categorized.to_excel(buffer, index=False)
-                    buffer.seek(0)
-                    categorized_files.append((f"Categorized_{file.name}", buffer))
-
-                    st.download_button(
-                        label=f"📥 Download {file.name}",
-                        data=buffer,
-                        file_name=f"Categorized_{file.name}",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                    categorized_files.append((f"Categorized_{file.name}", categorized))
+                    download_button(f"📥 Download {file.name}", categorized, f"Categorized_{file.name}")
                 else:
                     st.error(f"⚠️ No description column found in {file.name}.")
 
     if categorized_files:
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w") as zipf:
-            for fname, data in categorized_files:
-                zipf.writestr(fname, data.getvalue())
-        zip_buffer.seek(0)
-
-        st.download_button(
-            label="📦 Download All Categorized Files as ZIP",
-            data=zip_buffer,
-            file_name="Categorized_Files.zip",
-            mime="application/zip"
-        )
+        # Files and the ZIP are only serialized when the user asks for them
+        zip_download_button("📦 Download All Categorized Files as ZIP", categorized_files, "Categorized_Files.zip")
     elif not uploaded_files and not just_reset:
         st.info("👆 Upload files to begin.")
 
@@ -0,0 +1,157 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from itertools import chain
+
+# Bank modules are imported as top-level modules from pdf_app/, as in main.py
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT, "pdf_app"))
+
+from banks import BANKS, BANKS_BY_KEY, convert, iter_convert
+from shared.streaming import write_csv_chunks, write_xlsx_chunks
+
+# -------------------------------------
+# Headless batch conversion of bank statement PDFs
+# -------------------------------------
+
+FORMATS = ("csv", "xlsx", "parquet", "json")
+
+# Formats written chunk by chunk, without holding every transaction in memory
+STREAM_FORMATS = ("csv", "xlsx")
+
+
+def collect_pdfs(inputs):
+    """Expand files, directories (searched recursively) and glob patterns into a sorted list of PDF paths.
+
+    The sort only makes runs repeatable; banks.convert puts each bank's
+    statements in the order its combine() expects.
+    """
+    paths = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            matches = glob.glob(os.path.join(entry, "**", "*.pdf"), recursive=True)
+            matches += glob.glob(os.path.join(entry, "**", "*.PDF"), recursive=True)
+        elif os.path.isfile(entry):
+            matches = [entry]
+        else:
+            matches = glob.glob(entry, recursive=True)
+        paths.update(path for path in matches if os.path.isfile(path) and path.lower().endswith(".pdf"))
+    return sorted(paths)
+
+def write_output(df, output_path, fmt):
+    """Write the result table in the requested format, replacing the file only once it is complete."""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        if fmt == "csv":
+            df.to_csv(tmp_path, index=False)
+        elif fmt == "xlsx":
+            df.to_excel(tmp_path, index=False, engine="openpyxl")
+        elif fmt == "parquet":
+            df.astype({col: "string" for col in df.columns if df[col].dtype == object}).to_parquet(tmp_path, index=False)
+        else:
+            df.to_json(tmp_path, orient="records", date_format="iso", force_ascii=False)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _stored(frames, store, bank, totals):
+    """Pass frames through while adding them to the transaction store; totals collects [inserted, duplicates]."""
+    seen = {}
+    for df in frames:
+        inserted, duplicates = store.add(df, bank, seen)
+        totals[0] += inserted
+        totals[1] += duplicates
+        yield df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert bank statement PDFs to tables without the Streamlit UI.")
+    parser.add_argument("inputs", nargs="*", help="PDF files, directories or glob patterns")
+    parser.add_argument("-b", "--bank", default="auto", choices=["auto"] + [bank.key for bank in BANKS],
+                        help="bank format of every input, or auto to detect it per file (default: auto)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="parser processes (default: PDF_WORKERS or the CPU count)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default=None,
+                        help="output format (default: from the output extension, else csv)")
+    parser.add_argument("-o", "--output", default=None, help="output file (default: transactions.<format>)")
+    parser.add_argument("--opening-balance", type=float, default=None,
+                        help="opening balance for FAB and Mashreq statements")
+    parser.add_argument("--store", nargs="?", const="", default=None, metavar="PATH",
+                        help="also add the transactions to the local transaction store, skipping ones already "
+                             "stored (default path: TRANSACTION_STORE_PATH)")
+    parser.add_argument("--list-banks", action="store_true", help="list supported bank keys and exit")
+    args = parser.parse_args(argv)
+
+    if args.list_banks:
+        for bank in BANKS:
+            print(f"{bank.key:<18} {bank.name}")
+        return 0
+    if not args.inputs:
+        parser.error("no input PDFs given")
+
+    fmt = args.format
+    if fmt is None:
+        extension = os.path.splitext(args.output or "")[1].lstrip(".").lower()
+        fmt = extension if extension in FORMATS else "csv"
+    output_path = args.output or f"transactions.{fmt}"
+
+    paths = collect_pdfs(args.inputs)
+    if not paths:
+        print("No PDF files found.", file=sys.stderr)
+        return 1
+
+    bank_name = "auto-detected banks" if args.bank == "auto" else BANKS_BY_KEY[args.bank].name
+    print(f"Converting {len(paths)} PDF(s) from {bank_name}...", file=sys.stderr)
+    store = None
+    if args.store is not None:
+        from shared.transaction_store import TransactionStore
+
+        store = TransactionStore(args.store) if args.store else TransactionStore()
+    stored = [0, 0]
+
+    started = time.perf_counter()
+    parsed = []
+    if fmt in STREAM_FORMATS:
+        # Rows go to the output chunk by chunk as the statements are read
+        failures = []
+        frames = iter_convert(paths, args.bank, args.workers, args.opening_balance, failures, parsed)
+    else:
+        df, failures = convert(paths, args.bank, args.workers, args.opening_balance, parsed)
+        frames = iter([] if df is None or df.empty else [df])
+    if store is not None:
+        frames = _stored(frames, store, None if args.bank == "auto" else BANKS_BY_KEY[args.bank].name, stored)
+
+    first = next(frames, None)
+    rows = 0
+    if first is not None:
+        frames = chain([first], frames)
+        if fmt == "csv":
+            rows = write_csv_chunks(frames, output_path)
+        elif fmt == "xlsx":
+            rows = write_xlsx_chunks(frames, output_path)
+        else:
+            df = next(frames)
+            write_output(df, output_path, fmt)
+            rows = len(df)
+    elapsed = time.perf_counter() - started
+
+    for failure in failures:
+        print(f"Failed: {failure}", file=sys.stderr)
+
+    if store is not None:
+        print(f"Stored {stored[0]} new transaction(s) in {store.path}, {stored[1]} already stored.", file=sys.stderr)
+        store.close()
+
+    if not rows:
+        print("No transactions extracted.", file=sys.stderr)
+        return 1
+
+    print(f"Wrote {rows} transactions from {len(parsed)} file(s) to {output_path} "
+          f"in {elapsed:.1f}s.", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,6 @@
+import time
+_started = time.perf_counter()
+
 import streamlit as st
 import sys, os
 
@@ -102,3 +105,7 @@ with tab1:
 
 with tab2:
     categorizer_app.run()
+
+# Set APP_TIMING=1 to log how long each run takes to render (the first one is the cold start)
+if os.environ.get("APP_TIMING"):
+    print(f"Rendered in {time.perf_counter() - _started:.2f}s", file=sys.stderr)
@@ -1,23 +1,41 @@
-import streamlit as st
 import pdfplumber
 import pandas as pd
 import re
 import os
 from io import BytesIO
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.table_region import TableRegion
+from shared.pdf_cache import file_bytes
 
-def extract_transaction_table(file):
-    all_data = []
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
+
+column_headers = ["Date", "Description", "Debit", "Credit", "Balance"]
+
+# Printed header title the transaction table is found by; the first five of its columns are kept
+table_headers = ["Description"]
 
-    with pdfplumber.open(file) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
+def extract_page_rows(data, start=0, stop=None):
+    rows = []
+    region = TableRegion(table_headers, min_columns=len(column_headers))
+
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        for page in pdf.pages[start:stop]:
+            tables = region.extract_tables(page)
 
             for table in tables:
                 for row in table:
                     if row and len(row) >= 5:
-                        all_data.append(row[:5])  # First 5 columns only
+                        rows.append(row[:5])  # First 5 columns only
+
+    return rows
+
+def extract_transaction_table(file):
+    all_data = map_pages(extract_page_rows, file_bytes(file))
 
-    column_headers = ["Date", "Description", "Debit", "Credit", "Balance"]
     df = pd.DataFrame(all_data, columns=column_headers)
 
     date_pattern = re.compile(r"^\d{2}-\d{2}-\d{4}$")
@@ -31,8 +49,19 @@ def extract_transaction_table(file):
     final_df = final_df.reset_index(drop=True)
     return final_df
 
+def parse_file(data, filename="uploaded.pdf"):
+    return extract_transaction_table(data)
+
 # ------------------------- STREAMLIT APP -------------------------- #
+def combine(items):
+    results = ResultAccumulator()
+    for item in items:
+        if not item.error:
+            results.add(item.result, item.name)
+    return None if results.empty else results.result()
+
 def run():
+    import streamlit as st
     st.markdown(
         """
         <style>
@@ -52,20 +81,19 @@ def run():
     final_df = None
 
     if uploaded_files:
-        combined_df = pd.DataFrame()
+        items = parse_files("Adib2", PARSER_VERSION, parse_file, uploaded_files)
+        for item in items:
+            st.info(f"Processing: {item.name}")
+            if item.error:
+                st.error(f"❌ Failed to process {item.name}: {item.error}")
 
-        for file in uploaded_files:
-            st.info(f"Processing: {file.name}")
-            df = extract_transaction_table(file)
-            df["Source File"] = file.name
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
+        combined_df = combine(items)
 
-        if not combined_df.empty:
+        if combined_df is not None and not combined_df.empty:
             st.success("✅ Transactions Extracted")
             st.dataframe(combined_df, use_container_width=True)
 
-            csv = combined_df.to_csv(index=False).encode('utf-8')
-            st.download_button("📥 Download CSV", csv, "transactions.csv", "text/csv")
+            download_button("📥 Download CSV", combined_df, "transactions.csv")
 
             final_df = combined_df
 
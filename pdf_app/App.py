@@ -2,32 +2,46 @@
 
 import streamlit as st
 import pandas as pd
-from shared.core import save_converted_df
+from shared.core import new_session_id, save_converted_df
 from io import BytesIO
 
-# Import bank modules
-import Rak_Bank
-import al_jazira_bank
-import emirates_islamic_bank
-import fab_bank
-import Wio_bank
-import adib_bank
-import mashreq
-import adcb
-import Adib2
+# Bank modules (and their PDF libraries) are imported on first use through the registry
+from banks import BANKS_BY_KEY, OPENING_BALANCE_BANKS, combine_mixed, load, menu_banks, parse_mixed
+
+AUTO_DETECT = "🔎 Auto-detect (mixed banks)"
+
+def run_auto_detect():
+    uploaded_files = st.file_uploader("Upload statements from any supported bank", type="pdf", accept_multiple_files=True)
+    if not uploaded_files:
+        return None
+
+    # Route every file to its bank's parser from the first page, then parse all of them in one pass
+    grouped, unknown = parse_mixed(uploaded_files)
+    for name in unknown:
+        st.warning(f"⚠️ Could not recognise the bank of {name}, please pick the bank manually.")
+
+    for items in grouped.values():
+        for item in items:
+            if item.error:
+                st.error(f"❌ Failed to process {item.name}: {item.error}")
+
+    # Running-balance banks take their opening balance, as on their own pages
+    opening_balances = {}
+    for key in grouped:
+        if key not in OPENING_BALANCE_BANKS:
+            continue
+        value = st.text_input(f"Enter {BANKS_BY_KEY[key].name} Opening Balance (leave blank to auto-calculate)")
+        if value.strip():
+            try:
+                opening_balances[key] = float(value.replace(",", ""))
+            except ValueError:
+                st.error("Opening balance must be numeric.")
+                return None
+
+    return combine_mixed(grouped, opening_balances)
 
 def run():
-    bank_modules = {
-        "🏦 RAK Bank": Rak_Bank,
-        "🏢 Emirates Islamic Bank": emirates_islamic_bank,
-        "🏬 FAB Bank": fab_bank,
-        "🏛️ WIO Bank": Wio_bank,
-        "🏚️ ADIB Bank": adib_bank,
-        "🏚️ ADIB Bank - Format II": Adib2,
-        "🏠 Mashreq Neo Bank": mashreq,
-        "🏤 ADCB Bank": adcb
-        
-    }
+    bank_modules = {bank.label: bank for bank in menu_banks()}
 
     # UI Styling
     st.markdown("""
@@ -88,19 +102,44 @@ def run():
     st.markdown("<div class='subtext'>Convert your bank PDFs into clean, usable data \U0001F4C4 ➡️ \U0001F4C8</div>", unsafe_allow_html=True)
 
     st.markdown('<div class="dropdown-label"> Select Your Bank</div>', unsafe_allow_html=True)
-    selected_bank = st.selectbox("", list(bank_modules.keys()))
+    selected_bank = st.selectbox("", list(bank_modules.keys()) + [AUTO_DETECT])
     st.markdown("<hr>", unsafe_allow_html=True)
 
     if selected_bank:
-        df = bank_modules[selected_bank].run()
+        df = run_auto_detect() if selected_bank == AUTO_DETECT else load(bank_modules[selected_bank]).run()
         if isinstance(df, pd.DataFrame):
-            save_converted_df(df)
-            st.success("✅ PDF converted and saved as CSV successfully!")
+            from shared.interchange import to_transaction_table
+            from shared.schema import DESCRIPTION_COLUMN, to_canonical
+
+            # Every bank is handed on in the same typed layout
+            if selected_bank != AUTO_DETECT:
+                df = to_canonical(df, bank_modules[selected_bank].key)
+
+            if "session_id" not in st.session_state:
+                st.session_state["session_id"] = new_session_id()
+            table = to_transaction_table(df, DESCRIPTION_COLUMN)
+            save_converted_df(table, st.session_state["session_id"])
+            st.success("✅ PDF converted and saved successfully!")
+
+            # Keep the transactions across uploads; rows from overlapping statements are stored once.
+            # Streamlit reruns the script on every interaction, so each conversion is only added once.
+            from shared.artifacts import frame_digest
+            from shared.transaction_store import TransactionStore
+
+            digest = frame_digest(df)
+            if st.session_state.get("stored_digest") != digest:
+                bank = None if selected_bank == AUTO_DETECT else bank_modules[selected_bank].name
+                store = TransactionStore()
+                st.session_state["stored_counts"] = store.add(df, bank)
+                store.close()
+                st.session_state["stored_digest"] = digest
+            inserted, duplicates = st.session_state["stored_counts"]
+            st.info(f"🗄️ {inserted} new transaction(s) added to history, {duplicates} already stored.")
             st.dataframe(df.head())
 
             # ✅ Auto-push to Categorizer Tab with smooth toast & JS redirect
             st.toast("✅ PDF processed! Redirecting to Categorizer...", icon="🚀")
-            st.session_state["converted_df_for_categorization"] = df
+            st.session_state["converted_table_for_categorization"] = table
             st.session_state["active_tab"] = "Categorizer"
 
             st.markdown("""
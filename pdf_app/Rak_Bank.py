@@ -1,21 +1,34 @@
 # ✅ Fixed Rak_Bank.py – Streamlit-compatible + returns DataFrame to App.py
 
-import fitz  # PyMuPDF
 import re
 import pandas as pd
-import streamlit as st
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.pdf_text import backend_for, iter_page_texts
+from shared.numeric import nth_matches, to_number
+from shared.pdf_cache import file_bytes
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
 
 # Regular expression to identify date format
 date_pattern = re.compile(r'^\d{2}-[A-Za-z]{3}-\d{4}')
+amount_pattern = re.compile(r'\d[\d,]*\.\d{2}')
+deposit_pattern = "transfer from|deposit|credit|funds transfer"
 
-def process_pdf(pdf_file, filename="uploaded_file.pdf"):
-    transactions = []
-    current_trans = None
+columns = ["Source File", "Date", "Description", "Cheque", "Withdrawal", "Deposit", "Balance"]
 
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
+noise_keywords = [
+    "page", "date issued", "your current account transactions",
+    "account type: current account", "الإصدار", "مدة الكشف"
+]
 
-    for page in doc:
-        lines = page.get_text("text").splitlines()
+def extract_page_lines(data, start=0, stop=None):
+    kept = []
+    for page_text in iter_page_texts(data, start, stop, backend_for("Rak_Bank")):
+        lines = page_text.splitlines()
 
         # Identify start of transaction lines
         start_idx = 0
@@ -28,63 +41,83 @@ def process_pdf(pdf_file, filename="uploaded_file.pdf"):
             clean_line = line.strip()
             clean_line_lower = clean_line.lower()
 
-            if not clean_line or any(keyword in clean_line_lower for keyword in [
-                "page", "date issued", "your current account transactions",
-                "account type: current account", "الإصدار", "مدة الكشف"
-            ]):
+            if not clean_line or any(keyword in clean_line_lower for keyword in noise_keywords):
                 continue
 
-            if date_pattern.match(clean_line):
-                if current_trans:
-                    transactions.append(current_trans)
-
-                parts = clean_line.split(maxsplit=1)
-                date = parts[0]
-                description = parts[1] if len(parts) > 1 else ""
-
-                current_trans = {
-                    "PDF_File": filename,
-                    "Date": date,
-                    "Description": description,
-                    "Cheque": None,
-                    "Withdrawal": None,
-                    "Deposit": None,
-                    "Balance": None
-                }
-            else:
-                if current_trans:
-                    current_trans["Description"] += " " + clean_line
+            kept.append(clean_line)
+
+    return kept
+
+def process_pdf(pdf_file, filename="uploaded_file.pdf"):
+    transactions = []
+    current_trans = None
+
+    # Lines from all pages are merged first so transactions can run across page breaks
+    for clean_line in map_pages(extract_page_lines, file_bytes(pdf_file)):
+        if date_pattern.match(clean_line):
+            if current_trans:
+                transactions.append(current_trans)
+
+            parts = clean_line.split(maxsplit=1)
+            date = parts[0]
+            description = parts[1] if len(parts) > 1 else ""
+
+            current_trans = {
+                "Source File": filename,
+                "Date": date,
+                "Description": description,
+                "Cheque": None,
+                "Withdrawal": None,
+                "Deposit": None,
+                "Balance": None
+            }
+        else:
+            if current_trans:
+                current_trans["Description"] += " " + clean_line
 
     if current_trans:
         transactions.append(current_trans)
 
-    for trans in transactions:
-        desc = trans["Description"]
-        desc = desc.replace(" Cr.", "").replace(" Dr.", "")
-        amounts = re.findall(r'\d[\d,]*\.\d{2}', desc)
+    df = pd.DataFrame(transactions, columns=columns)
 
-        if len(amounts) >= 2:
-            amount_str = amounts[-2]
-            balance_str = amounts[-1]
+    # Last two amounts are the transaction amount and the balance, for every row at once
+    desc = df["Description"].str.replace(" Cr.", "", regex=False).str.replace(" Dr.", "", regex=False)
+    picked = nth_matches(desc, amount_pattern, [-2, -1])
+    has_amounts = picked[-2] != ""
+    amount = to_number(picked[-2])
+    is_deposit = desc.str.lower().str.contains(deposit_pattern, regex=True)
 
-            trans["Balance"] = float(balance_str.replace(",", ""))
-            amount_value = float(amount_str.replace(",", ""))
+    df["Balance"] = to_number(picked[-1]).where(has_amounts)
+    df["Deposit"] = amount.where(has_amounts & is_deposit)
+    df["Withdrawal"] = amount.where(has_amounts & ~is_deposit)
+    df.loc[has_amounts, "Description"] = [
+        text[:text.rfind(amount_str)].strip()
+        for text, amount_str in zip(desc[has_amounts], picked[-2][has_amounts])
+    ]
 
-            desc_lower = desc.lower()
-            if any(word in desc_lower for word in ["transfer from", "deposit", "credit", "funds transfer"]):
-                trans["Deposit"] = amount_value
-                trans["Withdrawal"] = None
-            else:
-                trans["Withdrawal"] = amount_value
-                trans["Deposit"] = None
+    return df
 
-            trans["Description"] = desc[:desc.rfind(amount_str)].strip()
-        else:
-            trans["Balance"] = None
+def parse_file(data, filename="uploaded_file.pdf"):
+    return process_pdf(data, filename)
+
+def combine(items):
+    results = ResultAccumulator()
+    for item in items:
+        if not item.error:
+            results.add(item.result)
+    if results.empty:
+        return None
 
-    return transactions
+    df = results.result()
+
+    # Clean out noisy lines
+    return df[~df["Description"].str.contains(
+        "account type: current account|الإصدار|مدة الكشف",
+        case=False, na=False
+    )]
 
 def run():
+    import streamlit as st
     st.markdown(
     """
     <style>
@@ -100,30 +133,22 @@ def run():
     )
     uploaded_files = st.file_uploader("Upload one or more RAK Bank PDF files", type="pdf", accept_multiple_files=True)
 
-    all_transactions = []
     final_df = None
 
     if uploaded_files:
-        for uploaded_file in uploaded_files:
-            st.info(f"Processing: {uploaded_file.name}")
-            transactions = process_pdf(uploaded_file, uploaded_file.name)
-            all_transactions.extend(transactions)
-
-        if all_transactions:
-            df = pd.DataFrame(all_transactions)
-
-            # Clean out noisy lines
-            df = df[~df["Description"].str.contains(
-                "account type: current account|الإصدار|مدة الكشف",
-                case=False, na=False
-            )]
-
+        items = parse_files("Rak_Bank", PARSER_VERSION, parse_file, uploaded_files)
+        for item in items:
+            st.info(f"Processing: {item.name}")
+            if item.error:
+                st.error(f"❌ Failed to process {item.name}: {item.error}")
+
+        df = combine(items)
+        if df is not None:
             st.success("✅ Transactions Extracted")
             st.dataframe(df, use_container_width=True)
 
             # Download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button("📥 Download CSV", csv, "transactions.csv", "text/csv")
+            download_button("📥 Download CSV", df, "transactions.csv")
 
             # ✅ RETURN final DataFrame to App.py
             final_df = df
@@ -1,8 +1,18 @@
-import streamlit as st
-import pdfplumber
 import pandas as pd
 import re
 from io import BytesIO
+from collections import deque
+from itertools import islice
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.pdf_text import backend_for, iter_page_texts
+from shared.pdf_cache import file_bytes
+from shared.streaming import batched, STREAM_CHUNK_ROWS
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
 
 # ---------- Regex Patterns ----------
 date_pattern = re.compile(r"^\d{2}/\d{2}/\d{4}")
@@ -12,12 +22,11 @@ iban_pattern = re.compile(r"AE\d{2}\d+")
 ref_number_pattern = re.compile(r"^[PA]\d{9}$")
 
 # ---------- Extract IBAN-Currency Mapping ----------
-def extract_iban_currency_map(pdf):
+def extract_iban_currency_map(data):
     supported_currencies = ["AED", "USD", "EUR"]
     iban_currency_map = {}
 
-    for page in pdf.pages[:2]:
-        text = page.extract_text()
+    for text in iter_page_texts(data, 0, 2, backend_for("Wio_bank")):
         if not text:
             continue
         lines = text.splitlines()
@@ -33,82 +42,126 @@ def extract_iban_currency_map(pdf):
     return iban_currency_map
 
 # ---------- Main PDF Processing Function ----------
+def iter_page_lines(data, start=0, stop=None):
+    for text in iter_page_texts(data, start, stop, backend_for("Wio_bank")):
+        if text:
+            yield from text.splitlines()
+
+def extract_page_lines(data, start=0, stop=None):
+    return list(iter_page_lines(data, start, stop))
+
+# Lines scanned after "Account holder name" for the account number and IBAN
+ACCOUNT_HEADER_LOOKAHEAD = 15
+
+def _with_lookahead(lines, size):
+    """Yield (line, window) where window holds that line and the next size - 1 lines."""
+    lines = iter(lines)
+    window = deque(islice(lines, size))
+    while window:
+        yield window[0], window
+        window.popleft()
+        following = next(lines, None)
+        if following is not None:
+            window.append(following)
+
+def iter_line_transactions(lines, iban_currency_map, filename):
+    current_account_number = None
+    current_iban = None
+
+    for line, upcoming in _with_lookahead(lines, ACCOUNT_HEADER_LOOKAHEAD):
+        clean_line = line.strip().lower()
+
+        if "account holder name" in clean_line:
+            current_account_number = None
+            current_iban = None
+
+            for l in upcoming:
+                l = l.strip()
+                if account_number_pattern.match(l):
+                    current_account_number = l
+                if iban_match := iban_pattern.search(l):
+                    current_iban = iban_match.group()
+                    if not current_account_number:
+                        current_account_number = current_iban[-10:]
+
+        if date_pattern.match(line.strip()):
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+
+            date = parts[0]
+            ref_candidate = parts[1]
+            if ref_number_pattern.match(ref_candidate):
+                ref_number = ref_candidate
+                desc_start = 2
+            else:
+                ref_number = ""
+                desc_start = 1
+
+            balance_match = amount_pattern.findall(line)
+            if len(balance_match) >= 2:
+                amount = balance_match[-2].replace(',', '')
+                balance = balance_match[-1].replace(',', '')
+                description = ' '.join(parts[desc_start:-2])
+            else:
+                amount = ""
+                balance = ""
+                description = ' '.join(parts[desc_start:])
+
+            currency = iban_currency_map.get(current_iban, None)
+
+            yield {
+                "Date": date,
+                "Ref Number": ref_number,
+                "Description": description.strip(),
+                "Amount": amount,
+                "Balance": balance,
+                "Currency": currency,
+                "Account Number": current_account_number,
+                "IBAN": current_iban,
+                "Source File": filename
+            }
+
+def extract_file_transactions(pdf_file, filename):
+    data = file_bytes(pdf_file)
+    iban_currency_map = extract_iban_currency_map(data)
+
+    # Account headers are looked up across the merged lines, not per page
+    lines = map_pages(extract_page_lines, data)
+    return list(iter_line_transactions(lines, iban_currency_map, filename))
+
+def iter_transaction_frames(pdf_file, filename, chunk_rows=STREAM_CHUNK_ROWS):
+    """Stream one statement as DataFrame chunks (bounded memory)."""
+    data = file_bytes(pdf_file)
+    iban_currency_map = extract_iban_currency_map(data)
+
+    records = iter_line_transactions(iter_page_lines(data), iban_currency_map, filename)
+    for chunk in batched(records, chunk_rows):
+        yield pd.DataFrame(chunk)
+
+def parse_file(data, filename="uploaded.pdf"):
+    return extract_file_transactions(data, filename)
+
+def combine(items):
+    results = ResultAccumulator()
+    for item in items:
+        if not item.error:
+            results.add(item.result)
+    return None if results.empty else results.result()
+
 def process_uploaded_pdfs(uploaded_files):
-    all_transactions = []
-
-    for uploaded_file in uploaded_files:
-        with pdfplumber.open(uploaded_file) as pdf:
-            iban_currency_map = extract_iban_currency_map(pdf)
-
-            lines = []
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    lines.extend(text.splitlines())
-
-        current_account_number = None
-        current_iban = None
-
-        for i, line in enumerate(lines):
-            clean_line = line.strip().lower()
-
-            if "account holder name" in clean_line:
-                current_account_number = None
-                current_iban = None
-
-                for j in range(i, i + 15):
-                    if j >= len(lines):
-                        break
-                    l = lines[j].strip()
-                    if account_number_pattern.match(l):
-                        current_account_number = l
-                    if iban_match := iban_pattern.search(l):
-                        current_iban = iban_match.group()
-                        if not current_account_number:
-                            current_account_number = current_iban[-10:]
-
-            if date_pattern.match(line.strip()):
-                parts = line.split()
-                if len(parts) < 2:
-                    continue
-
-                date = parts[0]
-                ref_candidate = parts[1]
-                if ref_number_pattern.match(ref_candidate):
-                    ref_number = ref_candidate
-                    desc_start = 2
-                else:
-                    ref_number = ""
-                    desc_start = 1
-
-                balance_match = amount_pattern.findall(line)
-                if len(balance_match) >= 2:
-                    amount = balance_match[-2].replace(',', '')
-                    balance = balance_match[-1].replace(',', '')
-                    description = ' '.join(parts[desc_start:-2])
-                else:
-                    amount = ""
-                    balance = ""
-                    description = ' '.join(parts[desc_start:])
-
-                currency = iban_currency_map.get(current_iban, None)
-
-                all_transactions.append({
-                    "Date": date,
-                    "Ref Number": ref_number,
-                    "Description": description.strip(),
-                    "Amount": amount,
-                    "Balance": balance,
-                    "Currency": currency,
-                    "Account Number": current_account_number,
-                    "IBAN": current_iban,
-                    "Source File": uploaded_file.name
-                })
-
-    return pd.DataFrame(all_transactions)
+    import streamlit as st
+    items = parse_files("Wio_bank", PARSER_VERSION, parse_file, uploaded_files)
+    for item in items:
+        if item.error:
+            st.error(f"❌ Failed to process {item.name}: {item.error}")
+
+    df = combine(items)
+    return pd.DataFrame() if df is None else df
 
 # ---------- Streamlit App Entry Point ----------
 def run():
+    import streamlit as st
     st.markdown(
         """
         <style>
@@ -138,12 +191,6 @@ def run():
 
                 for iban, group_df in final_df.groupby("IBAN"):
                     clean_iban = iban.replace('/', '_') if iban else "unknown"
-                    csv = group_df.to_csv(index=False).encode("utf-8")
-                    st.download_button(
-                        label=f"📥 Download CSV for IBAN {clean_iban}",
-                        data=csv,
-                        file_name=f"transactions_{clean_iban}.csv",
-                        mime="text/csv"
-                    )
+                    download_button(f"📥 Download CSV for IBAN {clean_iban}", group_df, f"transactions_{clean_iban}.csv")
 
     return final_df
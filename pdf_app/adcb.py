@@ -2,40 +2,72 @@
 
 import pdfplumber
 import pandas as pd
-import streamlit as st
+from io import BytesIO
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.table_region import TableRegion
+from shared.pdf_cache import file_bytes
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
 
 expected_headers = [
     "Posting Date", "Value Date", "Description", "Ref/Cheque No",
     "Debit Amount", "Credit Amount", "Balance"
 ]
 
+def extract_page_rows(data, start=0, stop=None):
+    rows = []
+    region = TableRegion(expected_headers)
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        for page in pdf.pages[start:stop]:
+            tables = region.extract_tables(page)
+            for table in tables:
+                for row in table:
+                    rows.append([cell.strip() if isinstance(cell, str) else "" for cell in row])
+    return rows
+
 def extract_transactions_from_pdf(file):
     all_data = []
     header_found = False
     header_index = []
 
-    with pdfplumber.open(file) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables:
-                for row in table:
-                    clean_row = [cell.strip() if isinstance(cell, str) else "" for cell in row]
-
-                    if not header_found and set(expected_headers).issubset(set(clean_row)):
-                        header_found = True
-                        header_index = [clean_row.index(col) for col in expected_headers]
-                        continue
+    # Page ranges may be extracted in parallel; the header state runs over the merged rows
+    for clean_row in map_pages(extract_page_rows, file_bytes(file)):
+        if not header_found and set(expected_headers).issubset(set(clean_row)):
+            header_found = True
+            header_index = [clean_row.index(col) for col in expected_headers]
+            continue
 
-                    elif header_found:
-                        if set(expected_headers).issubset(set(clean_row)):
-                            continue
-                        if len(clean_row) >= max(header_index) + 1:
-                            selected_row = [clean_row[i] for i in header_index]
-                            all_data.append(selected_row)
+        elif header_found:
+            if set(expected_headers).issubset(set(clean_row)):
+                continue
+            if len(clean_row) >= max(header_index) + 1:
+                selected_row = [clean_row[i] for i in header_index]
+                all_data.append(selected_row)
 
     return all_data
 
+def parse_file(data, filename="uploaded.pdf"):
+    return extract_transactions_from_pdf(data)
+
+def combine(items):
+    results = ResultAccumulator(columns=expected_headers)
+    for item in items:
+        if not item.error:
+            results.add(item.result, item.name)
+    if results.empty:
+        return None
+
+    df = results.result()
+    df.dropna(how='all', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
 def run():
+    import streamlit as st
     st.markdown(
     """
     <style>
@@ -53,25 +85,21 @@ def run():
     uploaded_files = st.file_uploader("Upload one or more ADCB Bank PDF statements", type="pdf", accept_multiple_files=True)
     
 
-    combined_data = []
     final_df = None
 
     if uploaded_files:
-        for file in uploaded_files:
-            st.info(f"🔍 Processing: {file.name}")
-            transactions = extract_transactions_from_pdf(file)
-            combined_data.extend(transactions)
-
-        if combined_data:
-            df = pd.DataFrame(combined_data, columns=expected_headers)
-            df.dropna(how='all', inplace=True)
-            df.reset_index(drop=True, inplace=True)
-
+        items = parse_files("adcb", PARSER_VERSION, parse_file, uploaded_files)
+        for item in items:
+            st.info(f"🔍 Processing: {item.name}")
+            if item.error:
+                st.error(f"❌ Failed to process {item.name}: {item.error}")
+
+        df = combine(items)
+        if df is not None:
             st.success("✅ Extraction complete!")
             st.dataframe(df, use_container_width=True)
 
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download CSV", csv, "adcb_transactions.csv", "text/csv")
+            download_button("⬇️ Download CSV", df, "adcb_transactions.csv")
 
             # ✅ Return DataFrame to App.py
             final_df = df
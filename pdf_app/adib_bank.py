@@ -1,43 +1,55 @@
 # ✅ Updated ADIB_Bank.py – Streamlit-compatible and returns DataFrame to App.py
 
-import streamlit as st
-import fitz  # PyMuPDF
 import re
 import pandas as pd
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.pdf_text import backend_for, iter_page_texts
+from shared.streaming import batched, STREAM_CHUNK_ROWS
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
 
 # === Patterns ===
 date_pattern = re.compile(r'^\d{2}-\d{2}-\d{4}$')
 
 # === Extract and structure transactions ===
-def extract_and_structure_transactions_from_bytes(file_bytes, filename):
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    all_lines = []
-
-    for page in doc:
-        lines = page.get_text().splitlines()
+def iter_page_lines(data, start=0, stop=None):
+    for page_text in iter_page_texts(data, start, stop, backend_for("adib_bank")):
+        lines = page_text.splitlines()
         for line in lines:
             line = line.strip()
             if line not in [
                 "Transaction Date", "Value Date", "Narrative",
                 "Transaction Reference", "Debit", "Credit", "Running Balance"
             ]:
-                all_lines.append(line)
-
-    transactions = []
-    i = 0
-    while i < len(all_lines) - 1:
-        if date_pattern.match(all_lines[i]) and date_pattern.match(all_lines[i + 1]):
-            txn_buffer = [all_lines[i], all_lines[i + 1]]
-            i += 2
-            while i < len(all_lines):
-                if i + 1 < len(all_lines) and date_pattern.match(all_lines[i]) and date_pattern.match(all_lines[i + 1]):
-                    break
-                txn_buffer.append(all_lines[i])
-                i += 1
-            transactions.append(txn_buffer)
-        else:
-            i += 1
-
+                yield line
+
+def extract_page_lines(data, start=0, stop=None):
+    return list(iter_page_lines(data, start, stop))
+
+# A transaction starts at two consecutive date lines and runs until the next such pair
+def iter_transaction_lines(lines):
+    lines = iter(lines)
+    current = next(lines, None)
+    txn_buffer = None
+    while current is not None:
+        following = next(lines, None)
+        if following is not None and date_pattern.match(current) and date_pattern.match(following):
+            if txn_buffer is not None:
+                yield txn_buffer
+            txn_buffer = [current, following]
+            current = next(lines, None)
+            continue
+        if txn_buffer is not None:
+            txn_buffer.append(current)
+        current = following
+    if txn_buffer is not None:
+        yield txn_buffer
+
+def structure_transactions(transactions, filename):
     structured_data = []
     for txn in transactions:
         try:
@@ -67,8 +79,29 @@ def extract_and_structure_transactions_from_bytes(file_bytes, filename):
 
     return df
 
+def extract_and_structure_transactions_from_bytes(pdf_bytes, filename):
+    all_lines = map_pages(extract_page_lines, pdf_bytes)
+    return structure_transactions(iter_transaction_lines(all_lines), filename)
+
+# === Stream a statement as DataFrame chunks (bounded memory) ===
+def iter_transaction_frames(pdf_bytes, filename, chunk_rows=STREAM_CHUNK_ROWS):
+    transactions = iter_transaction_lines(iter_page_lines(pdf_bytes))
+    for chunk in batched(transactions, chunk_rows):
+        yield structure_transactions(chunk, filename)
+
+def parse_file(data, filename="uploaded.pdf"):
+    return extract_and_structure_transactions_from_bytes(data, filename)
+
 # === Streamlit Integration ===
+def combine(items):
+    results = ResultAccumulator()
+    for item in items:
+        if not item.error:
+            results.add(item.result)
+    return None if results.empty else results.result()
+
 def run():
+    import streamlit as st
     st.markdown(
     """
     <style>
@@ -88,25 +121,19 @@ def run():
     final_df = None
 
     if uploaded_files:
-        combined_df = pd.DataFrame()
+        items = parse_files("adib_bank", PARSER_VERSION, parse_file, uploaded_files)
+        for item in items:
+            if item.error:
+                st.error(f"❌ Failed to process {item.name}: {item.error}")
 
-        for file in uploaded_files:
-            file_bytes = file.read()
-            df = extract_and_structure_transactions_from_bytes(file_bytes, file.name)
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
+        combined_df = combine(items)
 
-        if not combined_df.empty:
+        if combined_df is not None and not combined_df.empty:
             st.success("✅ Transactions Extracted")
             st.dataframe(combined_df, use_container_width=True)
 
             # Download as CSV
-            csv_data = combined_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                "📥 Download CSV",
-                data=csv_data,
-                file_name="adib_transactions.csv",
-                mime="text/csv"
-            )
+            download_button("📥 Download CSV", combined_df, "adib_transactions.csv")
 
             # ✅ Return DataFrame to App.py
             final_df = combined_df
@@ -1,69 +1,99 @@
-import streamlit as st
 import pdfplumber
 import pandas as pd
 import re
 from io import BytesIO
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.table_region import TableRegion
+from shared.pdf_cache import file_bytes
+from shared.normalize import ARABIC_INDIC_DIGITS, normalize_frame
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
 
 # 🔢 Convert Arabic-Indic digits to Western numerals
 def convert_arabic_indic_to_western(text):
-    arabic_indic_numerals = {
-        '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
-        '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9'
-    }
-    for arabic_num, western_num in arabic_indic_numerals.items():
-        text = text.replace(arabic_num, western_num)
-    return text
+    return text.translate(ARABIC_INDIC_DIGITS)
+
+columns = ["Transaction Date", "Value Date", "Description", "Withdrawal (Dr)", "Deposit (Cr)", "Running Balance"]
+
+# Printed header titles the transaction table is found by
+table_headers = ["Withdrawal (Dr)", "Deposit (Cr)"]
+
+def column_positions(titles):
+    """Index of each expected column among printed header titles, or None if one is missing."""
+    cells = [" ".join(str(cell or "").split()).lower() for cell in titles]
+    positions = [cells.index(name.lower()) for name in columns if name.lower() in cells]
+    return positions if len(positions) == len(columns) else None
+
+def table_positions(table, region):
+    # Header row of the table, else the header the crop region learned, else the usual fixed layout
+    for row in table:
+        positions = column_positions(row)
+        if positions:
+            return positions
+    if region.layout is not None and region.enabled and len(table[0]) == len(region.layout.titles):
+        positions = column_positions(region.layout.titles)
+        if positions:
+            return positions
+    if len(table[0]) == len(columns):
+        return list(range(len(columns)))
+    raise ValueError(f"Transaction table has {len(table[0])} columns and no recognisable header row.")
 
 # 📝 Extract transactions using structural table extraction (column-wise)
-def extract_transactions_structural(pdf_bytes):
-    transactions = []
-    with pdfplumber.open(pdf_bytes) as pdf:
-        for page in pdf.pages:
-            table = page.extract_table()
+def extract_page_transactions(data, start=0, stop=None):
+    page_frames = []
+    region = TableRegion(table_headers, min_columns=len(columns))
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        for page in pdf.pages[start:stop]:
+            table = region.extract_table(page)
             if not table:
                 continue
 
-            df = pd.DataFrame(table)
-
-            # Set expected column names (adjust if needed)
-            df.columns = ["Transaction Date", "Value Date", "Description", "Withdrawal (Dr)", "Deposit (Cr)", "Running Balance"]
+            # Expected columns picked by their header title, extra printed columns are left out
+            positions = table_positions(table, region)
+            df = pd.DataFrame([[row[i] for i in positions] for row in table], columns=columns)
             df = df.dropna(subset=["Transaction Date", "Description"]).reset_index(drop=True)
 
-            # Convert Arabic-Indic numerals to Western
-            df = df.applymap(lambda x: convert_arabic_indic_to_western(str(x)) if pd.notnull(x) else x)
+            # Arabic-Indic numerals, presentation forms and dashes, one translate per column
+            page_frames.append(normalize_frame(df))
+
+    return page_frames
 
-            for _, row in df.iterrows():
-                transaction = {
-                    "Transaction Date": row["Transaction Date"],
-                    "Value Date": row["Value Date"],
-                    "Description": row["Description"],
-                    "Withdrawal (Dr)": row["Withdrawal (Dr)"],
-                    "Deposit (Cr)": row["Deposit (Cr)"],
-                    "Running Balance": row["Running Balance"]
-                }
-                transactions.append(transaction)
+def extract_transactions_structural(pdf_bytes):
+    page_frames = [df for df in map_pages(extract_page_transactions, file_bytes(pdf_bytes)) if not df.empty]
+    if not page_frames:
+        return pd.DataFrame()
+    return pd.concat(page_frames, ignore_index=True)
 
-    return pd.DataFrame(transactions)
+def parse_file(data, filename="uploaded.pdf"):
+    return extract_transactions_structural(data)
 
 # ✅ Processing multiple PDFs
+def combine(items):
+    results = ResultAccumulator()
+    for item in items:
+        if not item.error:
+            results.add(item.result, item.name)
+    return None if results.empty else results.result()
+
 def process(pdf_files):
+    import streamlit as st
     st.info("Extracting transactions from Aljazira Bank statements...")
 
-    all_transactions = []
+    items = parse_files("al_jazira_bank", PARSER_VERSION, parse_file, pdf_files)
+    for item in items:
+        if item.error:
+            st.error(f"❌ Failed to process {item.name}: {item.error}")
 
-    for pdf_file in pdf_files:
-        df = extract_transactions_structural(pdf_file)
-        if not df.empty:
-            all_transactions.append(df)
-
-    if all_transactions:
-        final_df = pd.concat(all_transactions, ignore_index=True)
-        return final_df
-    else:
-        return pd.DataFrame()
+    df = combine(items)
+    return pd.DataFrame() if df is None else df
 
 # ✅ Required run() function for Streamlit
 def run():
+    import streamlit as st
     #st.header("Bank PDF Processor")
     st.markdown(
     """
@@ -90,5 +120,4 @@ def run():
             st.success("✅ Transactions extracted successfully!")
             st.dataframe(df)
 
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button("Download CSV", csv, "al_jazira_transactions.csv", "text/csv")
+            download_button("Download CSV", df, "al_jazira_transactions.csv")
@@ -0,0 +1,271 @@
+import importlib
+from collections import namedtuple
+
+import pandas as pd
+
+from shared.detect import detect
+from shared import pdf_cache
+from shared.parallel import FileResult, parse_files, parse_jobs, pool_slots
+from shared.pdf_cache import file_bytes, file_name
+from shared.schema import CANONICAL_COLUMNS, to_canonical
+from shared.streaming import STREAM_CHUNK_ROWS
+
+# -------------------------------------
+# Bank registry and automatic format routing
+# -------------------------------------
+
+# fingerprints: (phrase, weight) pairs looked up as whole words in the first page text and PDF metadata.
+# Bank names weigh most; table headers separate the formats of one bank.
+class Bank(namedtuple("Bank", ["key", "name", "icon", "module", "fingerprints", "in_menu"])):
+    __slots__ = ()
+
+    @property
+    def label(self):
+        """Menu label shown in the bank picker."""
+        return f"{self.icon} {self.name}".strip()
+
+BANKS = [
+    Bank("rak", "RAK Bank", "🏦", "Rak_Bank", [
+        ("rakbank", 3), ("national bank of ras al khaimah", 3),
+        ("your current account transactions", 2), ("date issued", 1),
+    ], True),
+    Bank("emirates_islamic", "Emirates Islamic Bank", "🏢", "emirates_islamic_bank", [
+        ("emirates islamic", 3), ("narration", 1), ("running balance", 1),
+    ], True),
+    # The address line runs into the account label ("United Arab EmiratesAC-NUM")
+    Bank("fab", "FAB Bank", "🏬", "fab_bank", [
+        ("first abu dhabi bank", 3), ("ac-num", 1), ("emiratesac-num", 1), ("sheet no", 1),
+        ("balance brought forward", 1),
+    ], True),
+    Bank("wio", "WIO Bank", "🏛️", "Wio_bank", [
+        ("wio bank", 3), ("account holder name", 1),
+    ], True),
+    Bank("adib", "ADIB Bank", "🏚️", "adib_bank", [
+        ("abu dhabi islamic bank", 3), ("narrative", 1), ("transaction reference", 1),
+    ], True),
+    Bank("adib2", "ADIB Bank - Format II", "🏚️", "Adib2", [
+        ("abu dhabi islamic bank", 3), ("description", 1), ("narrative", -1),
+        ("transaction reference", -1),
+    ], True),
+    Bank("mashreq", "Mashreq Neo Bank", "🏠", "mashreq", [
+        ("mashreq", 3), ("neo", 1), ("the items and balance shown", 1),
+    ], True),
+    Bank("adcb", "ADCB Bank", "🏤", "adcb", [
+        ("abu dhabi commercial bank", 3), ("adcb", 2), ("posting date", 1),
+        ("ref/cheque no", 1),
+    ], True),
+    Bank("al_jazira", "Al Jazira Bank", "", "al_jazira_bank", [
+        ("aljazira", 3), ("al jazira", 3), ("withdrawal (dr)", 1), ("deposit (cr)", 1),
+    ], False),
+]
+
+BANKS_BY_KEY = {bank.key: bank for bank in BANKS}
+
+# Banks whose amounts are running-balance differences and accept an opening balance
+OPENING_BALANCE_BANKS = ("fab", "mashreq")
+
+# Columns of every chunk streamed from a mixed upload, so chunks of different banks line up
+MIXED_STREAM_COLUMNS = [col for col in CANONICAL_COLUMNS if col != "Categorization"]
+
+_FINGERPRINTS = {bank.key: bank.fingerprints for bank in BANKS}
+
+
+def menu_banks():
+    """Banks offered in the bank picker, in display order."""
+    return [bank for bank in BANKS if bank.in_menu]
+
+def load(bank):
+    """Import the parser module of a Bank (or bank key)."""
+    if isinstance(bank, str):
+        bank = BANKS_BY_KEY[bank]
+    return importlib.import_module(bank.module)
+
+def detect_bank(file):
+    """Bank a statement belongs to, judged from its first page only; None if unrecognised."""
+    key = detect(file_bytes(file), _FINGERPRINTS)
+    return BANKS_BY_KEY[key] if key else None
+
+def group_by_bank(files, unknown):
+    """{bank key: files} of a mixed upload, each bank's files in statement_order(); unrecognised names go to unknown."""
+    grouped = {}
+    for file in files:
+        bank = detect_bank(file)
+        if bank is None:
+            unknown.append(file_name(file))
+            continue
+        grouped.setdefault(bank.key, []).append(file)
+    return {key: statement_order(load(key), group) for key, group in grouped.items()}
+
+def parse_mixed(files, workers=None):
+    """Detect and parse a mixed upload in one parallel pass.
+
+    Returns ({bank key: [FileResult, ...]}, [unrecognised file names]); each
+    bank's results are in statement_order() so they can go straight to its combine().
+    """
+    unknown = []
+    jobs, keys = [], []
+    for key, group in group_by_bank(files, unknown).items():
+        module = load(key)
+        jobs += [(module.__name__, module.PARSER_VERSION, module.parse_file, file) for file in group]
+        keys += [key] * len(group)
+
+    grouped = {}
+    for key, item in zip(keys, parse_jobs(jobs, workers)):
+        grouped.setdefault(key, []).append(item)
+    return grouped, unknown
+
+
+def combine_mixed(grouped, opening_balances=None):
+    """Combine each bank's results with its combine() and stack them in the canonical schema with a Bank column; None if empty.
+
+    opening_balances maps bank keys to the opening balance of that bank's statements.
+    """
+    opening_balances = opening_balances or {}
+    frames = []
+    for key, items in grouped.items():
+        bank = BANKS_BY_KEY[key]
+        df = _combine(load(bank), key, items, opening_balances.get(key))
+        if df is None or df.empty:
+            continue
+        df.insert(0, "Bank", bank.name)
+        frames.append(to_canonical(df, key))
+    # Categorical columns with different categories concat to plain text, so they are typed again
+    return to_canonical(pd.concat(frames, ignore_index=True, sort=False)) if frames else None
+
+def convert(files, bank="auto", workers=None, opening_balance=None, parsed=None):
+    """Parse statements of one bank (or auto-detected banks) without a UI.
+
+    Returns (DataFrame in the canonical schema or None, [failure messages]).
+    The names of the files parsed without error are appended to parsed.
+    """
+    parsed = [] if parsed is None else parsed
+    failures = []
+    if bank == "auto":
+        grouped, unknown = parse_mixed(files, workers)
+        failures += [f"{name}: bank not recognised" for name in unknown]
+        failures += [f"{item.name}: {item.error}" for items in grouped.values() for item in items if item.error]
+        parsed += [item.name for items in grouped.values() for item in items if not item.error]
+        return combine_mixed(grouped, mixed_opening_balances(opening_balance, grouped, failures)), failures
+
+    module = load(bank)
+    items = parse_files(module.__name__, module.PARSER_VERSION, module.parse_file, statement_order(module, files), workers)
+    failures += [f"{item.name}: {item.error}" for item in items if item.error]
+    parsed += [item.name for item in items if not item.error]
+    df = _combine(module, bank, items, opening_balance)
+    return (None if df is None else to_canonical(df, bank)), failures
+
+def mixed_opening_balances(opening_balance, keys, failures):
+    """{bank key: opening balance} for a mixed upload given one opening balance.
+
+    It can only belong to the upload's one bank that takes an opening
+    balance; with statements of several such banks it is ignored and a
+    failure message says so.
+    """
+    keys = [key for key in keys if key in OPENING_BALANCE_BANKS]
+    if opening_balance is None or not keys:
+        return {}
+    if len(keys) > 1:
+        names = " and ".join(BANKS_BY_KEY[key].name for key in keys)
+        failures.append(f"opening balance ignored: the upload has both {names} statements")
+        return {}
+    return {keys[0]: opening_balance}
+
+def statement_order(module, files):
+    """Files in the order the bank's combine() expects: by statement number for parsers that define extract_number."""
+    if hasattr(module, "extract_number"):
+        return sorted(files, key=lambda file: module.extract_number(file_name(file)))
+    return list(files)
+
+def _combine(module, key, items, opening_balance=None):
+    if opening_balance is not None and key in OPENING_BALANCE_BANKS:
+        return module.combine(items, opening_balance)
+    return module.combine(items)
+
+def _result_chunks(result):
+    # Parsers return a DataFrame or a list of records
+    rows = result.iloc if isinstance(result, pd.DataFrame) else result
+    for start in range(0, 0 if result is None else len(result), STREAM_CHUNK_ROWS):
+        yield rows[start:start + STREAM_CHUNK_ROWS]
+
+def _file_chunks(module, files, workers, failures):
+    """(name, chunks) of each file in order.
+
+    With worker processes available, files are parsed through the cache and
+    the pool, as many at a time as there are workers, and each file's result
+    is handed on in chunks. Otherwise a cached result is reused and anything
+    else is read page by page in this thread.
+    """
+    slots = pool_slots(workers)
+    if slots:
+        for start in range(0, len(files), slots):
+            for item in parse_files(module.__name__, module.PARSER_VERSION, module.parse_file,
+                                    files[start:start + slots], workers):
+                if item.error:
+                    failures.append(f"{item.name}: {item.error}")
+                else:
+                    yield item.name, _result_chunks(item.result)
+        return
+
+    for file in files:
+        name = file_name(file)
+        cached = pdf_cache.get(pdf_cache.file_key(file, module.__name__, module.PARSER_VERSION))
+        if cached is not None:
+            yield name, _result_chunks(cached)
+        else:
+            yield name, module.iter_transaction_frames(file_bytes(file), name)
+
+def _stream_bank(key, files, opening_balance, failures, workers=None, parsed=None):
+    """Canonical chunks of one bank's statements, in statement order, for parsers with iter_transaction_frames."""
+    module = load(key)
+    previous = opening_balance
+    for name, chunks in _file_chunks(module, statement_order(module, files), workers, failures):
+        try:
+            for chunk in chunks:
+                df = _combine(module, key, [FileResult(name, chunk, None)], previous)
+                if df is None or df.empty:
+                    continue
+                if key in OPENING_BALANCE_BANKS:
+                    # Carry the balance over so amounts at chunk and file boundaries match combine()
+                    last = df["Balance"].iloc[-1]
+                    previous = None if pd.isna(last) else float(last)
+                yield to_canonical(df, key)
+        except Exception as e:
+            failures.append(f"{name}: {type(e).__name__}: {e}")
+        else:
+            if parsed is not None:
+                parsed.append(name)
+
+def iter_convert(files, bank="auto", workers=None, opening_balance=None, failures=None, parsed=None):
+    """Yield the canonical transactions of statements chunk by chunk, for writing straight to an output.
+
+    Banks whose parser has iter_transaction_frames are parsed in the worker
+    pool (and the parse cache) one window of files at a time, or read page
+    by page in this thread when there are no worker processes, so only a
+    few files' rows are held at once. The others are converted one bank at
+    a time with convert(). Failure messages are appended to failures, and
+    the names of files parsed without error to parsed, as they happen.
+    """
+    failures = [] if failures is None else failures
+    if bank != "auto":
+        groups = [(bank, list(files))]
+        opening_balances = {bank: opening_balance}
+    else:
+        unknown = []
+        grouped = group_by_bank(files, unknown)
+        failures += [f"{name}: bank not recognised" for name in unknown]
+        groups = grouped.items()
+        opening_balances = mixed_opening_balances(opening_balance, grouped, failures)
+
+    for key, group in groups:
+        module = load(key)
+        if hasattr(module, "iter_transaction_frames"):
+            frames = _stream_bank(key, group, opening_balances.get(key), failures, workers, parsed)
+        else:
+            df, group_failures = convert(group, key, workers, opening_balances.get(key), parsed)
+            failures += group_failures
+            frames = [] if df is None or df.empty else [df]
+        for df in frames:
+            if bank == "auto":
+                df.insert(0, "Bank", BANKS_BY_KEY[key].name)
+                df = df.reindex(columns=MIXED_STREAM_COLUMNS)
+            yield df
@@ -2,81 +2,109 @@
 
 import pdfplumber
 import pandas as pd
-import streamlit as st
+from io import BytesIO
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.table_region import TableRegion
+from shared.pdf_cache import file_bytes
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
 
 # -------------------- PDF Parsing Logic --------------------
 
 header_keywords = ["Transaction Date", "Narration", "Debit", "Credit", "Running Balance"]
+columns = ["Transaction Date", "Narration", "Debit", "Credit", "Account Balance"]
 
-def process(pdf_files):
-    all_transactions = []
+def extract_page_rows(data, start=0, stop=None):
+    structured_data = []
+    # Six columns are read from each row, one of them has no title in header_keywords
+    region = TableRegion(header_keywords, min_columns=6)
 
-    for pdf_file in pdf_files:
-        structured_data = []
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        for page in pdf.pages[start:stop]:
+            table = region.extract_table(page)
 
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                table = page.extract_table()
+            if table:
+                for row in table:
+                    if len(row) < 6:
+                        continue
 
-                if table:
-                    for row in table:
-                        if len(row) < 6:
-                            continue
+                    if any(header in row[0] for header in header_keywords) and "Running Balance" in row:
+                        continue
 
-                        if any(header in row[0] for header in header_keywords) and "Running Balance" in row:
-                            continue
+                    transaction_date = row[0].replace("\n", " ").strip()
+                    narration = row[2].replace("\n", " ").strip()
 
-                        transaction_date = row[0].replace("\n", " ").strip()
-                        narration = row[2].replace("\n", " ").strip()
+                    debit = 0.0
+                    credit = 0.0
 
+                    try:
+                        if row[3] and row[3] != "0.00":
+                            debit = float(row[3].replace(',', '').strip())
+                    except ValueError:
                         debit = 0.0
+
+                    try:
+                        if row[4] and row[4] != "0.00":
+                            credit = float(row[4].replace(',', '').strip())
+                    except ValueError:
                         credit = 0.0
 
-                        try:
-                            if row[3] and row[3] != "0.00":
-                                debit = float(row[3].replace(',', '').strip())
-                        except ValueError:
-                            debit = 0.0
+                    running_balance = row[5].replace("\n", " ").strip() if len(row) > 5 else None
+
+                    structured_data.append([transaction_date, narration, debit, credit, running_balance])
+
+    return structured_data
+
+def extract_rows(pdf_file):
+    return map_pages(extract_page_rows, file_bytes(pdf_file))
 
-                        try:
-                            if row[4] and row[4] != "0.00":
-                                credit = float(row[4].replace(',', '').strip())
-                        except ValueError:
-                            credit = 0.0
+def parse_file(data, filename="uploaded.pdf"):
+    return extract_rows(data)
 
-                        running_balance = row[5].replace("\n", " ").strip() if len(row) > 5 else None
+def process(pdf_files):
+    results = ResultAccumulator(columns=columns)
+
+    for item in parse_files("emirates_islamic_bank", PARSER_VERSION, parse_file, pdf_files):
+        if item.error:
+            raise RuntimeError(f"Failed to process {item.name}: {item.error}")
+        results.add(item.result, item.name)
+
+    return merge_transactions(results.result())
 
-                        structured_data.append([transaction_date, narration, debit, credit, running_balance])
+def combine(items):
+    results = ResultAccumulator(columns=columns)
+    for item in items:
+        if not item.error:
+            results.add(item.result, item.name)
+    return None if results.empty else merge_transactions(results.result())
 
-        all_transactions.extend(structured_data)
+def merge_transactions(all_transactions):
+    if not isinstance(all_transactions, pd.DataFrame):
+        all_transactions = pd.DataFrame(all_transactions, columns=columns)
 
     # ✅ Return empty DataFrame if no transactions found
-    if not all_transactions:
-        return pd.DataFrame(columns=["Transaction Date", "Narration", "Debit", "Credit", "Account Balance"])
+    if all_transactions.empty:
+        return pd.DataFrame(columns=columns)
 
-    df_combined = pd.DataFrame(all_transactions, columns=["Transaction Date", "Narration", "Debit", "Credit", "Account Balance"])
+    df_combined = all_transactions
     df_combined = df_combined[df_combined["Transaction Date"] != "Transaction Date"]
     df_combined["Account Balance"] = df_combined["Account Balance"].astype(str)
     df_combined["Transaction Date"] = pd.to_datetime(df_combined["Transaction Date"], format="%d-%m-%Y", errors='coerce')
     df_combined = df_combined.dropna(subset=["Transaction Date"])
 
-    merged_data = []
-    prev_row = None
-
-    for _, row in df_combined.iterrows():
-        if prev_row is not None and row["Account Balance"] == prev_row["Account Balance"]:
-            prev_row["Narration"] += " " + row["Narration"]
-            prev_row["Debit"] = max(prev_row["Debit"], row["Debit"])
-            prev_row["Credit"] = max(prev_row["Credit"], row["Credit"])
-        else:
-            if prev_row is not None:
-                merged_data.append(prev_row)
-            prev_row = row.copy()
-
-    if prev_row is not None:
-        merged_data.append(prev_row)
+    # Continuation rows repeat the running balance: each change of balance starts a new transaction
+    balance = df_combined["Account Balance"]
+    starts = (balance != balance.shift()).to_numpy()
+    grouped = df_combined.groupby(starts.cumsum(), sort=False)
 
-    df_final = pd.DataFrame(merged_data)
+    df_final = df_combined[starts].copy()
+    df_final["Narration"] = grouped["Narration"].agg(" ".join).to_numpy()
+    df_final["Debit"] = grouped["Debit"].max().to_numpy()
+    df_final["Credit"] = grouped["Credit"].max().to_numpy()
     df_final = df_final.sort_values(by="Transaction Date", ascending=True)
     df_final = df_final.drop_duplicates(subset=["Account Balance"], keep="first")
 
@@ -85,6 +113,7 @@ def process(pdf_files):
 # -------------------- Streamlit UI --------------------
 
 def run():
+    import streamlit as st
     st.markdown(
     """
     <style>
@@ -105,16 +134,19 @@ def run():
 
     if uploaded_files:
         st.info("Processing uploaded files...")
-        df = process(uploaded_files)
+        items = parse_files("emirates_islamic_bank", PARSER_VERSION, parse_file, uploaded_files)
+        for item in items:
+            if item.error:
+                st.error(f"❌ Failed to process {item.name}: {item.error}")
+        df = combine(items)
 
-        if df.empty:
+        if df is None or df.empty:
             st.warning("⚠️ No transactions found.")
         else:
             st.success("✅ Transactions extracted successfully!")
             st.dataframe(df, use_container_width=True)
 
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button("📥 Download CSV", csv, "emirates_islamic_transactions.csv", "text/csv")
+            download_button("📥 Download CSV", df, "emirates_islamic_transactions.csv")
 
             # ✅ Return to App.py
             final_df = df
@@ -1,45 +1,59 @@
-import streamlit as st
-import PyPDF2
 import re
 import pandas as pd
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.pdf_text import backend_for, iter_page_texts
+from shared.pdf_cache import file_bytes
+from shared.streaming import batched, STREAM_CHUNK_ROWS
+from shared.numeric import nth_matches, strip_thousands
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
 
 # Step 1: Extract cleaned lines
-def extract_clean_lines(pdf_file):
-    unwanted_phrases = [
-        "Important:", "*T&Cs Apply", "600  52  5500", "First Abu Dhabi Bank PJSC",
-        "We shall endeavor", "KHALID MOHAMED OBAID", "P.O.BOX 35566",
-        "United Arab EmiratesAC-NUM", "IBAN", "Old Account Number",
-        "Account Statement FROM", "Sheet no", "Balance brought forward"
-    ]
-    lines = []
-    reader = PyPDF2.PdfReader(pdf_file)
-    for page in reader.pages:
-        page_text = page.extract_text()
+unwanted_phrases = [
+    "Important:", "*T&Cs Apply", "600  52  5500", "First Abu Dhabi Bank PJSC",
+    "We shall endeavor", "KHALID MOHAMED OBAID", "P.O.BOX 35566",
+    "United Arab EmiratesAC-NUM", "IBAN", "Old Account Number",
+    "Account Statement FROM", "Sheet no", "Balance brought forward"
+]
+
+def iter_page_lines(data, start=0, stop=None):
+    for page_text in iter_page_texts(data, start, stop, backend_for("fab_bank")):
         if page_text:
             for line in page_text.splitlines():
                 if not any(phrase in line for phrase in unwanted_phrases):
                     clean = re.sub(r'\s+', ' ', line.strip())
                     if clean:
-                        lines.append(clean)
-    return lines
+                        yield clean
+
+def extract_page_lines(data, start=0, stop=None):
+    return list(iter_page_lines(data, start, stop))
+
+def extract_clean_lines(pdf_file):
+    # Transactions are grouped after the merge, so page ranges can be split freely
+    return map_pages(extract_page_lines, file_bytes(pdf_file))
 
 # Step 2: Identify transaction start line
 def is_transaction_start(line):
     return re.match(r"^\d{1,2} \w{3} \d{4}\s+\d{1,2} \w{3} \d{4}", line) is not None
 
 # Step 3: Group lines per transaction
-def group_transactions(lines):
-    transactions = []
+def iter_transaction_blocks(lines):
     current = []
     for line in lines:
         if is_transaction_start(line):
             if current:
-                transactions.append(current)
+                yield current
                 current = []
         current.append(line)
     if current:
-        transactions.append(current)
-    return transactions
+        yield current
+
+def group_transactions(lines):
+    return list(iter_transaction_blocks(lines))
 
 # Step 4: Extract date & description
 def extract_date_and_description(block):
@@ -68,23 +82,18 @@ def extract_date_and_description(block):
     }
 
 # Step 5: Extract amount & balance
-def extract_amount_balance_from_description(description):
-    matches = re.findall(r'(?<!\d)(-?\d{1,3}(?:,\d{3})*\.\d{2})(?!\s*%)', description)
-    if len(matches) >= 2:
-        amount = matches[0].replace(',', '')
-        balance = matches[1].replace(',', '')
-    elif len(matches) == 1:
-        amount = matches[0].replace(',', '')
-        balance = ''
-    else:
-        amount = balance = ''
-    return pd.Series([amount, balance])
+amount_pattern = re.compile(r'(?<!\d)(-?\d{1,3}(?:,\d{3})*\.\d{2})(?!\s*%)')
+
+def extract_amount_balance(descriptions):
+    # First amount is the transaction amount, second the balance; one extractall pass for all rows
+    picked = nth_matches(descriptions, amount_pattern, [0, 1])
+    return pd.DataFrame({
+        'Amount': strip_thousands(picked[0]),
+        'Balance': strip_thousands(picked[1]),
+    }, index=descriptions.index)
 
 # Step 6: Process single PDF
-def process_pdf(pdf_file, filename="uploaded.pdf"):
-    lines = extract_clean_lines(pdf_file)
-    blocks = group_transactions(lines)
-    data = [extract_date_and_description(block) for block in blocks]
+def build_transactions_frame(data, filename):
     df = pd.DataFrame(data)
     df['Source File'] = filename
 
@@ -93,9 +102,45 @@ def process_pdf(pdf_file, filename="uploaded.pdf"):
     df = df[~df['Description_clean'].str.contains("date value date description debit credit balance")]
     df.drop(columns=['Description_clean'], inplace=True)
 
-    df[['Amount', 'Balance']] = df['Description'].apply(extract_amount_balance_from_description)
+    df[['Amount', 'Balance']] = extract_amount_balance(df['Description'])
     return df
 
+def process_pdf(pdf_file, filename="uploaded.pdf"):
+    lines = extract_clean_lines(pdf_file)
+    blocks = group_transactions(lines)
+    data = [extract_date_and_description(block) for block in blocks]
+    return build_transactions_frame(data, filename)
+
+# Step 6a: Stream a single PDF as DataFrame chunks (bounded memory)
+def iter_transaction_frames(pdf_file, filename="uploaded.pdf", chunk_rows=STREAM_CHUNK_ROWS):
+    blocks = iter_transaction_blocks(iter_page_lines(file_bytes(pdf_file)))
+    records = (extract_date_and_description(block) for block in blocks)
+    for chunk in batched(records, chunk_rows):
+        yield build_transactions_frame(chunk, filename)
+
+# Step 6b: Parse raw PDF bytes (cache / worker entry point)
+def parse_file(data, filename="uploaded.pdf"):
+    return process_pdf(data, filename)
+
+# Step 6c: Combine parsed files (in statement order) into the final table
+def combine(items, opening_balance=None):
+    results = ResultAccumulator()
+    for item in items:
+        if not item.error:
+            results.add(item.result)
+    if results.empty:
+        return None
+
+    final_df = results.result()
+
+    final_df['Balance'] = pd.to_numeric(final_df['Balance'], errors='coerce')
+    final_df['Extracted Amount'] = final_df['Balance'].diff()
+    if opening_balance is not None and not final_df.empty:
+        final_df.loc[0, 'Extracted Amount'] = final_df.loc[0, 'Balance'] - opening_balance
+
+    final_df['Extracted Amount'] = final_df['Extracted Amount'].round(2)
+    return final_df
+
 # Step 7: Extract number for filename sorting
 def extract_number(filename):
     numbers = re.findall(r'\d+', filename)
@@ -103,6 +148,7 @@ def extract_number(filename):
 
 # Step 8: Streamlit entry point
 def run():
+    import streamlit as st
     st.markdown(
         """
         <style>
@@ -164,27 +210,18 @@ def run():
 
         uploaded_files = sorted(uploaded_files, key=lambda x: extract_number(x.name))
 
-        all_dfs = []
-        for file in uploaded_files:
-            st.write(f"📄 Processing: {file.name}")
-            df = process_pdf(file, file.name)
-            all_dfs.append(df)
-
-        if all_dfs:
-            final_df = pd.concat(all_dfs, ignore_index=True)
-
-            final_df['Balance'] = pd.to_numeric(final_df['Balance'], errors='coerce')
-            final_df['Extracted Amount'] = final_df['Balance'].diff()
-            if opening_balance is not None and not final_df.empty:
-                final_df.loc[0, 'Extracted Amount'] = final_df.loc[0, 'Balance'] - opening_balance
-
-            final_df['Extracted Amount'] = final_df['Extracted Amount'].round(2)
+        items = parse_files("fab_bank", PARSER_VERSION, parse_file, uploaded_files)
+        for item in items:
+            st.write(f"📄 Processing: {item.name}")
+            if item.error:
+                st.error(f"❌ Failed to process {item.name}: {item.error}")
 
+        final_df = combine(items, opening_balance)
+        if final_df is not None:
             st.success("✅ Transactions Extracted")
             st.dataframe(final_df, use_container_width=True)
 
-            csv = final_df.to_csv(index=False).encode("utf-8")
-            st.download_button("📥 Download CSV", csv, "fab_transactions.csv", "text/csv")
+            download_button("📥 Download CSV", final_df, "fab_transactions.csv")
         else:
             st.warning("⚠️ No valid transactions found.")
 
@@ -1,9 +1,128 @@
-import PyPDF2
 import re
 import pandas as pd
-import streamlit as st
+from shared.parallel import parse_files
+from shared.accumulate import ResultAccumulator
+from shared.artifacts import download_button
+from shared.pages import map_pages
+from shared.pdf_text import backend_for, iter_page_texts
+from shared.numeric import nth_matches
+from shared.normalize import normalize_text
+from shared.pdf_cache import file_bytes
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = 1
+
+def extract_number(filename):
+    numbers = re.findall(r'\d+', filename)
+    return int(numbers[0]) if numbers else float('inf')
+
+unwanted_phrases = [
+    "Opening balance", "ﺍﻟﺘﺎﺭﻳﺦ", "ﺍﻟﻤﻌﺎﻣﻠﺔ", "ﺭﻗﻢ ﺍﻟﻤﺮﺟﻊ", "ﻗﻴﻮﺩ",
+    "ﻗﻴﻮﺩ ﺩﺍﺋﻨﻪ", "ﺍﻟﺮﺻﻴﺪ", "page", "The items and balance shown",
+    "of the statement date", "All charges, terms and conditions",
+    "Please note that for foreign currency", "verified. Report any discrepancies",
+    "accurate.", "indicative only",
+    "ﺍﻟﺮﺟﺎﺀ ﺍﻟﺘﺄﻛﺪ ﻣﻦ ﺻﺤﺔ ﺍﻟﻤﻌﺎﻣﻼﺕ ﻭﺍﻟﻤﺒﺎﻟﻎ ﺍﻟﻤﺒﻴﻨﺔ ﻏﻰ ﻫﺬﺍ ﺍﻟﻜﺸﻒ",
+    "Closing balance", "8 of 8"
+]
+
+# Statements mix Arabic presentation forms and base letters; compare both sides normalized
+normalized_unwanted_phrases = [normalize_text(phrase) for phrase in unwanted_phrases]
+
+of_pattern = re.compile(r'\bof\s*\d+\b', re.IGNORECASE)
+date_pattern = re.compile(r'\b\d{4}-\d{2}-\d{2}(?=\D)', re.IGNORECASE)
+amount_pattern = re.compile(r'\b(?:\d{1,3}(?:,\d{3})*|\d+)\.\d{1,2}\b|\b0\b')
+header_pattern = re.compile(r'Date\s*Transaction\s*Reference\s*Number\s*Debit\s*Balance\s*Credit', re.IGNORECASE)
+
+def extract_page_lines(data, start=0, stop=None):
+    kept = []
+    for text in iter_page_texts(data, start, stop, backend_for("mashreq")):
+        if text:
+            lines = text.splitlines()
+            for line in lines:
+                line = line.strip()
+                line = header_pattern.sub('', line)
+
+                probe = normalize_text(line)
+                if any(phrase in probe for phrase in normalized_unwanted_phrases) or of_pattern.search(line):
+                    continue
+
+                kept.append(line)
+    return kept
+
+def extract_transactions(file):
+    transactions = []
+    current_transaction = []
+    current_date = ""
+    # Grouping runs over the merged lines so a transaction may continue on the next page
+    for line in map_pages(extract_page_lines, file_bytes(file)):
+        date_match = date_pattern.search(line)
+        if date_match:
+            if current_transaction:
+                transactions.append((current_date, current_transaction))
+                current_transaction = []
+            current_date = date_match.group()
+            current_transaction.append(line)
+        else:
+            current_transaction.append(line)
+
+    if current_transaction:
+        transactions.append((current_date, current_transaction))
+
+    return transactions
+
+def parse_structured_data(transactions):
+    df = pd.DataFrame({
+        "Date": [date for date, _ in transactions],
+        "Description": [" ".join(lines).strip() for _, lines in transactions],
+    }, dtype=object)
+
+    # The last amount in a transaction is its running balance
+    balance = nth_matches(df["Description"], amount_pattern, [-1])[-1]
+    has_balance = balance != ""
+
+    def remove_balance(text, value):
+        index = text.rfind(value)
+        return (text[:index] + text[index + len(value):]).strip()
+
+    df.loc[has_balance, "Description"] = [
+        remove_balance(text, value) for text, value in zip(df["Description"][has_balance], balance[has_balance])
+    ]
+    df["Description"] = df["Description"].str.replace(r'\s+', ' ', regex=True)
+    df["Balance"] = balance
+    return df
+
+def parse_file(data, filename="uploaded.pdf"):
+    transactions = extract_transactions(data)
+    df = parse_structured_data(transactions)
+
+    df = df[
+        df['Date'].notna() &
+        df['Balance'].notna() &
+        (df['Date'].str.strip() != "") &
+        (df['Balance'].str.strip() != "")
+    ]
+
+    df['Balance'] = df['Balance'].str.replace(",", "").astype(float)
+    return df
+
+def combine(items, opening_balance=None):
+    results = ResultAccumulator()
+    for item in items:
+        if item.error:
+            continue
+        # Amounts are balance differences within each statement
+        df = item.result
+        df['Amount'] = df['Balance'].diff()
+        if opening_balance is not None and not df.empty:
+            df.loc[df.index[0], 'Amount'] = df.loc[df.index[0], 'Balance'] - opening_balance
+
+        results.add(df, item.name)
+
+    return None if results.empty else results.result()
 
 def run():
+    import streamlit as st
     st.markdown(
         """
         <style>
@@ -64,113 +183,20 @@ def run():
         st.info("📂 Please upload PDF files to begin.")
         return None
 
-    def extract_number(filename):
-        numbers = re.findall(r'\d+', filename)
-        return int(numbers[0]) if numbers else float('inf')
-
     uploaded_files = sorted(uploaded_files, key=lambda x: extract_number(x.name))
 
-    unwanted_phrases = [
-        "Opening balance", "ﺍﻟﺘﺎﺭﻳﺦ", "ﺍﻟﻤﻌﺎﻣﻠﺔ", "ﺭﻗﻢ ﺍﻟﻤﺮﺟﻊ", "ﻗﻴﻮﺩ",
-        "ﻗﻴﻮﺩ ﺩﺍﺋﻨﻪ", "ﺍﻟﺮﺻﻴﺪ", "page", "The items and balance shown",
-        "of the statement date", "All charges, terms and conditions",
-        "Please note that for foreign currency", "verified. Report any discrepancies",
-        "accurate.", "indicative only",
-        "ﺍﻟﺮﺟﺎﺀ ﺍﻟﺘﺄﻛﺪ ﻣﻦ ﺻﺤﺔ ﺍﻟﻤﻌﺎﻣﻼﺕ ﻭﺍﻟﻤﺒﺎﻟﻎ ﺍﻟﻤﺒﻴﻨﺔ ﻏﻰ ﻫﺬﺍ ﺍﻟﻜﺸﻒ",
-        "Closing balance", "8 of 8"
-    ]
-
-    of_pattern = re.compile(r'\bof\s*\d+\b', re.IGNORECASE)
-    date_pattern = re.compile(r'\b\d{4}-\d{2}-\d{2}(?=\D)', re.IGNORECASE)
-    amount_pattern = re.compile(r'\b(?:\d{1,3}(?:,\d{3})*|\d+)\.\d{1,2}\b|\b0\b')
-    header_pattern = re.compile(r'Date\s*Transaction\s*Reference\s*Number\s*Debit\s*Balance\s*Credit', re.IGNORECASE)
-
-    def extract_transactions(file):
-        transactions = []
-        current_transaction = []
-        current_date = ""
-        reader = PyPDF2.PdfReader(file)
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                lines = text.splitlines()
-                for line in lines:
-                    line = line.strip()
-                    line = header_pattern.sub('', line)
-
-                    if any(phrase in line for phrase in unwanted_phrases) or of_pattern.search(line):
-                        continue
-
-                    date_match = date_pattern.search(line)
-                    if date_match:
-                        if current_transaction:
-                            transactions.append((current_date, current_transaction))
-                            current_transaction = []
-                        current_date = date_match.group()
-                        current_transaction.append(line)
-                    else:
-                        current_transaction.append(line)
-
-        if current_transaction:
-            transactions.append((current_date, current_transaction))
-
-        return transactions
-
-    def parse_structured_data(transactions):
-        structured_data = []
-        for date, lines in transactions:
-            full_text = " ".join(lines).strip()
-            all_amounts = amount_pattern.findall(full_text)
-            balance = all_amounts[-1] if all_amounts else ""
-
-            if balance:
-                balance_index = full_text.rfind(balance)
-                description = (full_text[:balance_index] + full_text[balance_index + len(balance):]).strip()
-            else:
-                description = full_text
-
-            description = re.sub(r'\s+', ' ', description)
-
-            structured_data.append({
-                "Date": date,
-                "Description": description,
-                "Balance": balance
-            })
-        return structured_data
-
-    all_data = []
-    final_df = None
-
-    for file in uploaded_files:
-        st.info(f"📄 Processing: {file.name}")
-        transactions = extract_transactions(file)
-        structured_data = parse_structured_data(transactions)
-        df = pd.DataFrame(structured_data)
-
-        df = df[
-            df['Date'].notna() &
-            df['Balance'].notna() &
-            (df['Date'].str.strip() != "") &
-            (df['Balance'].str.strip() != "")
-        ]
-
-        df['Balance'] = df['Balance'].str.replace(",", "").astype(float)
-        df['Amount'] = df['Balance'].diff()
-        if opening_balance is not None and not df.empty:
-            df.loc[df.index[0], 'Amount'] = df.loc[df.index[0], 'Balance'] - opening_balance
-
-        df['Source_File'] = file.name
-        all_data.append(df)
-
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-        final_df.reset_index(drop=True, inplace=True)
+    items = parse_files("mashreq", PARSER_VERSION, parse_file, uploaded_files)
+    for item in items:
+        st.info(f"📄 Processing: {item.name}")
+        if item.error:
+            st.error(f"❌ Failed to process {item.name}: {item.error}")
 
+    final_df = combine(items, opening_balance)
+    if final_df is not None:
         st.success("✅ All PDFs processed successfully!")
         st.dataframe(final_df, use_container_width=True)
 
-        csv = final_df.to_csv(index=False).encode("utf-8")
-        st.download_button("⬇️ Download CSV", csv, "all_statements_combined.csv", "text/csv")
+        download_button("⬇️ Download CSV", final_df, "all_statements_combined.csv")
     else:
         st.warning("⚠️ No valid transactions extracted from the PDFs.")
 
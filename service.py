@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from itertools import chain
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# Bank modules are imported as top-level modules from pdf_app/, as in main.py
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT, "pdf_app"))
+
+from banks import BANKS, BANKS_BY_KEY, iter_convert, load
+from shared import parallel
+from shared.core import categorize_values, find_description_column
+from shared.matcher_resource import get_matcher, matcher_version
+from shared.streaming import STREAM_CHUNK_ROWS
+
+# -------------------------------------
+# Local HTTP service for conversion and categorization
+# -------------------------------------
+
+# Requests with a body at least this large count as large jobs
+LARGE_JOB_BYTES = int(float(os.environ.get("SERVICE_LARGE_JOB_MB", "10")) * 1024 * 1024)
+
+# Concurrent small and large jobs; separate slots so large jobs cannot starve small ones
+SMALL_JOB_SLOTS = int(os.environ.get("SERVICE_SMALL_JOBS", "4"))
+LARGE_JOB_SLOTS = int(os.environ.get("SERVICE_LARGE_JOBS", "1"))
+
+# Parser processes reserved for large jobs; small jobs get the rest of the worker budget
+LARGE_JOB_WORKERS = int(os.environ.get("SERVICE_LARGE_WORKERS", "0")) or None
+
+# Seconds a request waits for a free slot before it is turned away with 503
+QUEUE_TIMEOUT = float(os.environ.get("SERVICE_QUEUE_TIMEOUT", "60"))
+
+# Largest accepted request body
+MAX_BODY_BYTES = int(float(os.environ.get("SERVICE_MAX_BODY_MB", "200")) * 1024 * 1024)
+
+OUTPUT_FORMATS = ("csv", "ndjson")
+
+
+class ServiceError(Exception):
+    """Error reported to the client with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def worker_budget(total=None, large=LARGE_JOB_WORKERS):
+    """(small, large) parser processes out of total; large jobs get a quarter unless set."""
+    total = total or parallel.MAX_WORKERS
+    large = large or max(1, total // 4)
+    return max(1, total - large), large
+
+
+class JobLimiter:
+    """Separate concurrency slots and parser pools for small and large jobs.
+
+    Each class parses in its own pool ("small" or "large", started by
+    warm_up), so a large job's pages never queue ahead of a small job's.
+    """
+
+    def __init__(self, small=SMALL_JOB_SLOTS, large=LARGE_JOB_SLOTS, threshold=LARGE_JOB_BYTES, timeout=QUEUE_TIMEOUT):
+        self.small = threading.BoundedSemaphore(max(1, small))
+        self.large = threading.BoundedSemaphore(max(1, large))
+        self.threshold = threshold
+        self.timeout = timeout
+        self.workers = dict(zip(("small", "large"), worker_budget()))
+
+    @contextmanager
+    def slot(self, size):
+        kind = "large" if size >= self.threshold else "small"
+        semaphore = self.large if kind == "large" else self.small
+        if not semaphore.acquire(timeout=self.timeout):
+            raise ServiceError(503, "Server busy, retry later.")
+        try:
+            with parallel.use_pool(kind, self.workers[kind]):
+                yield
+        finally:
+            semaphore.release()
+
+
+limiter = JobLimiter()
+
+
+def _uploaded_files(content_type, body, default_name):
+    """PDF uploads from a multipart/form-data body, or the raw body as a single file."""
+    if not content_type.startswith("multipart/form-data"):
+        upload = BytesIO(body)
+        upload.name = default_name
+        return [upload]
+
+    message = BytesParser(policy=default_policy).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    files = []
+    for part in message.iter_parts():
+        if part.get_filename() is None:
+            continue
+        upload = BytesIO(part.get_payload(decode=True) or b"")
+        upload.name = part.get_filename()
+        files.append(upload)
+    return files
+
+def _frame_chunks(frames, fmt):
+    """Encode DataFrames as one CSV or NDJSON stream, STREAM_CHUNK_ROWS rows at a time."""
+    first = True
+    for df in frames:
+        for start in range(0, len(df), STREAM_CHUNK_ROWS):
+            chunk = df.iloc[start:start + STREAM_CHUNK_ROWS]
+            if fmt == "csv":
+                yield chunk.to_csv(index=False, header=first).encode("utf-8")
+            else:
+                yield chunk.to_json(orient="records", lines=True, date_format="iso", force_ascii=False).encode("utf-8")
+                yield b"\n"
+            first = False
+
+def _categorized_chunks(body, column, fmt):
+    """Categorize a CSV statement chunk by chunk; only one chunk is in memory at a time."""
+    matcher = get_matcher()
+    reader = pd.read_csv(BytesIO(body), chunksize=STREAM_CHUNK_ROWS)
+    first = True
+    desc_col = column
+    for chunk in reader:
+        if desc_col is None:
+            desc_col = find_description_column(chunk.columns)
+            if not desc_col:
+                raise ServiceError(400, "No description column found in uploaded statement.")
+        elif desc_col not in chunk.columns:
+            raise ServiceError(400, f"Column '{desc_col}' not found in uploaded statement.")
+        chunk["Categorization"] = categorize_values(chunk[desc_col], matcher)
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=first).encode("utf-8")
+        else:
+            yield chunk.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+            yield b"\n"
+        first = False
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StatementService/1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "banks": [bank.key for bank in BANKS],
+                "matcher_version": matcher_version(),
+            })
+        else:
+            self._send_json(404, {"error": "Not found."})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            handler = {"/convert": self._convert, "/categorize": self._categorize}.get(url.path)
+            if handler is None:
+                raise ServiceError(404, "Not found.")
+            body = self._read_body()
+            fmt = query.get("format", "csv")
+            if fmt not in OUTPUT_FORMATS:
+                raise ServiceError(400, f"Unknown format '{fmt}'. Choose from {', '.join(OUTPUT_FORMATS)}.")
+            with limiter.slot(len(body)):
+                chunks, headers, trailers = handler(body, query, fmt)
+                # Pull the first chunk before committing to a 200 so early errors still get a proper status
+                first = next(chunks, b"")
+                self._stream(fmt, first, chunks, headers, trailers)
+        except ServiceError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _convert(self, body, query, fmt):
+        bank = query.get("bank", "auto")
+        if bank != "auto" and bank not in BANKS_BY_KEY:
+            raise ServiceError(400, f"Unknown bank '{bank}'.")
+        try:
+            opening_balance = float(query["opening_balance"]) if query.get("opening_balance") else None
+        except ValueError:
+            raise ServiceError(400, "opening_balance must be numeric.")
+
+        files = _uploaded_files(self.headers.get("Content-Type", ""), body, query.get("name", "uploaded.pdf"))
+        if not files:
+            raise ServiceError(400, "No PDF files in request.")
+
+        # Transactions are streamed out as the statements are read. Clients sending
+        # "TE: trailers" get every failure in the trailer; others only get the ones
+        # known before the first chunk, as a header
+        failures = []
+        frames = iter_convert(files, bank, opening_balance=opening_balance, failures=failures)
+        first = next(frames, None)
+        if first is None:
+            raise ServiceError(422, "; ".join(failures) or "No transactions extracted.")
+        chunks = _frame_chunks(chain([first], frames), fmt)
+        if "trailers" not in self.headers.get("TE", "").lower():
+            return chunks, ({"X-Failed-Files": json.dumps(failures)} if failures else {}), None
+
+        def trailers():
+            return {"X-Failed-Files": json.dumps(failures)} if failures else {}
+
+        return chunks, {"Trailer": "X-Failed-Files"}, trailers
+
+    def _categorize(self, body, query, fmt):
+        return _categorized_chunks(body, query.get("column"), fmt), {}, None
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            raise ServiceError(411, "Send the request with a Content-Length.")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ServiceError(413, "Request body too large.")
+        if not length:
+            raise ServiceError(400, "Empty request body.")
+        return self.rfile.read(length)
+
+    def _stream(self, fmt, first, chunks, headers, trailers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self._write_chunk(first)
+            for chunk in chunks:
+                self._write_chunk(chunk)
+        except Exception:
+            # Headers are already out; drop the connection so the client sees a truncated response
+            self.close_connection = True
+            return
+        trailer = "".join(f"{name}: {value}\r\n" for name, value in (trailers() if trailers else {}).items())
+        self.wfile.write(b"0\r\n" + trailer.encode("latin-1") + b"\r\n")
+
+    def _write_chunk(self, data):
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 503:
+            self.send_header("Retry-After", "5")
+        if status >= 400:
+            # The request body may not have been read, do not reuse the connection
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def warm_up(workers=None):
+    """Import every parser, start the small and large job pools and compile the matcher before the first request."""
+    for bank in BANKS:
+        load(bank)
+    limiter.workers = dict(zip(("small", "large"), worker_budget(workers)))
+    for kind, count in limiter.workers.items():
+        parallel.warm_pool(count, kind)
+    try:
+        get_matcher()
+    except Exception as e:
+        print(f"Master sheet not loaded yet ({e}); /categorize will retry on first use.", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve PDF conversion and categorization over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="parser processes, split between small and large jobs "
+                             "(default: PDF_WORKERS or the CPU count)")
+    args = parser.parse_args(argv)
+
+    warm_up(args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        parallel.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import pandas as pd
+
+# -------------------------------------
+# Combining per-file results from the bank parsers
+# -------------------------------------
+
+SOURCE_COLUMN = "Source File"
+
+
+class ResultAccumulator:
+    """Collect per-file frames or record batches and combine them in one concat.
+
+    Appending to a DataFrame inside the file loop copies everything gathered
+    so far on every iteration; this keeps the pieces and joins them once.
+    """
+
+    def __init__(self, columns=None, source_column=SOURCE_COLUMN):
+        self.columns = list(columns) if columns is not None else None
+        self.source_column = source_column
+        self._frames = []
+
+    def add(self, result, source=None):
+        """Add a DataFrame or a list of records (dicts, or rows matching columns)."""
+        if result is None:
+            return
+        if isinstance(result, pd.DataFrame):
+            df = result
+        else:
+            if not result:
+                return
+            columns = self.columns if not isinstance(result[0], dict) else None
+            df = pd.DataFrame(result, columns=columns)
+        if df.empty:
+            return
+        if source is not None:
+            df[self.source_column] = source
+        self._frames.append(df)
+
+    def __len__(self):
+        return sum(len(df) for df in self._frames)
+
+    @property
+    def empty(self):
+        return not self._frames
+
+    def result(self):
+        """Return all collected rows as one DataFrame with a uniform column layout."""
+        if not self._frames:
+            return pd.DataFrame(columns=self.columns or [])
+
+        columns = []
+        for df in self._frames:
+            columns.extend(col for col in df.columns if col not in columns)
+        # Keep the source column last so every bank shows it in the same place
+        if self.source_column in columns:
+            columns.remove(self.source_column)
+            columns.append(self.source_column)
+
+        frames = [df if list(df.columns) == columns else df.reindex(columns=columns) for df in self._frames]
+        return pd.concat(frames, ignore_index=True)
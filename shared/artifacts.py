@@ -0,0 +1,169 @@
+import hashlib
+import os
+import pickle
+import zipfile
+
+import pandas as pd
+
+from shared.streaming import STREAM_CHUNK_ROWS, write_csv_chunks, write_xlsx_chunks
+
+# -------------------------------------
+# On-demand export files, cached by content hash
+# -------------------------------------
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "shared/outputs/artifacts")
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip",
+}
+
+
+def frame_digest(df):
+    """Content hash of a DataFrame (values, columns and dtypes)."""
+    digest = hashlib.sha256(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cell values
+        digest.update(pickle.dumps(df.to_numpy().tolist(), protocol=pickle.HIGHEST_PROTOCOL))
+    return digest.hexdigest()
+
+class _HashSink:
+    """Write-only file object that hashes what is written to it."""
+
+    closed = False
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+def table_digest(table):
+    """Content hash of an Arrow table, from its IPC stream written batch by batch."""
+    import pyarrow as pa
+
+    sink = _HashSink()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=STREAM_CHUNK_ROWS):
+            writer.write_batch(batch)
+    return sink.digest.hexdigest()
+
+def source_digest(source):
+    """Content hash of a DataFrame or an Arrow table."""
+    return frame_digest(source) if isinstance(source, pd.DataFrame) else table_digest(source)
+
+def _artifact_path(digest, fmt, artifact_dir):
+    os.makedirs(artifact_dir, exist_ok=True)
+    return os.path.join(artifact_dir, f"{digest}.{fmt}")
+
+def _frame_chunks(source):
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), STREAM_CHUNK_ROWS):
+            yield source.iloc[start:start + STREAM_CHUNK_ROWS]
+    else:
+        # Arrow tables are converted one record batch at a time
+        for batch in source.to_batches(max_chunksize=STREAM_CHUNK_ROWS):
+            yield batch.to_pandas()
+
+def export_frame(df, fmt="csv", digest=None, artifact_dir=ARTIFACT_DIR):
+    """Path of a DataFrame or Arrow table exported as csv or xlsx, written only if this content was not exported before."""
+    path = _artifact_path(digest or source_digest(df), fmt, artifact_dir)
+    if os.path.exists(path):
+        return path
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if fmt == "csv" and isinstance(df, pd.DataFrame):
+            df.to_csv(tmp_path, index=False)
+        elif fmt == "csv":
+            write_csv_chunks(_frame_chunks(df), tmp_path)
+        elif fmt == "xlsx":
+            write_xlsx_chunks(_frame_chunks(df), tmp_path)
+        else:
+            raise ValueError(f"Unsupported export format '{fmt}'.")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+def _source_key(source):
+    """Hashable identity of a DataFrame or Arrow table (content) or a file on disk (path, size, mtime)."""
+    if isinstance(source, str):
+        stat = os.stat(source)
+        return (source, stat.st_size, stat.st_mtime_ns)
+    return source_digest(source)
+
+def _entries_digest(entries):
+    return hashlib.sha256(repr([(name, _source_key(source)) for name, source in entries]).encode("utf-8")).hexdigest()
+
+def export_zip(entries, artifact_dir=ARTIFACT_DIR, digest=None):
+    """Path of a ZIP holding (name, file path) entries, streamed from disk into the archive file."""
+    entries = list(entries)
+    zip_path = _artifact_path(digest or _entries_digest(entries), "zip", artifact_dir)
+    if os.path.exists(zip_path):
+        return zip_path
+    tmp_path = f"{zip_path}.{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, path in entries:
+                archive.write(path, name)
+        os.replace(tmp_path, zip_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return zip_path
+
+def _export_format(file_name):
+    extension = os.path.splitext(file_name)[1].lstrip(".").lower()
+    return extension if extension in ("csv", "xlsx") else "xlsx"
+
+def _offer(st, label, key, digest, build, file_name, mime):
+    """Show a prepare button until the artifact for digest exists, then the real download button."""
+    state_key = f"artifact:{key}"
+    prepared = st.session_state.get(state_key)
+    if not (prepared and prepared[0] == digest and os.path.exists(prepared[1])):
+        if not st.button(f"⚙️ Prepare {file_name}", key=f"{state_key}:prepare"):
+            return None
+        with st.spinner(f"Preparing {file_name}..."):
+            prepared = (digest, build())
+        st.session_state[state_key] = prepared
+
+    with open(prepared[1], "rb") as f:
+        st.download_button(label, data=f, file_name=file_name, mime=mime, key=f"{state_key}:download")
+    return prepared[1]
+
+def download_button(label, df, file_name, fmt=None, key=None):
+    """Streamlit download for a DataFrame or Arrow table that is only serialized once the user asks for it.
+
+    fmt defaults to the file name's extension (csv or xlsx). Returns the
+    artifact path once prepared, else None.
+    """
+    import streamlit as st
+
+    fmt = fmt or _export_format(file_name)
+    digest = source_digest(df)
+    return _offer(st, label, key or file_name, digest, lambda: export_frame(df, fmt, digest), file_name, MIME_TYPES[fmt])
+
+def zip_download_button(label, entries, file_name, key=None):
+    """Streamlit download of a ZIP built on demand from (name, DataFrame, Arrow table or file path) entries."""
+    import streamlit as st
+
+    entries = list(entries)
+    digest = _entries_digest(entries)
+
+    def build():
+        files = [(name, source if isinstance(source, str) else export_frame(source, _export_format(name)))
+                 for name, source in entries]
+        return export_zip(files, digest=digest)
+
+    return _offer(st, label, key or file_name, digest, build, file_name, MIME_TYPES["zip"])
@@ -0,0 +1,95 @@
+import os
+
+import pandas as pd
+
+from shared.core import categorize_values, find_description_column
+from shared.streaming import STREAM_CHUNK_ROWS, batched, write_csv_chunks, write_xlsx_chunks
+
+# -------------------------------------
+# Chunked categorization of large statement exports
+# -------------------------------------
+
+# Uploads at least this large are categorized in streaming mode
+STREAM_THRESHOLD_BYTES = int(float(os.environ.get("CATEGORIZE_STREAM_MB", "20")) * 1024 * 1024)
+
+# File signatures: xlsx is a zip container, legacy xls an OLE2 compound file
+_SIGNATURES = (
+    (b"PK\x03\x04", "xlsx"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "xls"),
+)
+
+
+def _rewind(file):
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+def sniff_format(file):
+    """'xlsx', 'xls' or 'csv' from the first bytes of a file object or path."""
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            head = f.read(8)
+    else:
+        _rewind(file)
+        head = file.read(8)
+        _rewind(file)
+    for signature, kind in _SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    return "csv"
+
+def _xlsx_chunks(file, chunk_rows):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+        for batch in batched(rows, chunk_rows):
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+def read_chunks(file, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield the statement as DataFrame chunks, choosing the reader from the file's content."""
+    kind = sniff_format(file)
+    _rewind(file)
+    if kind == "xlsx":
+        yield from _xlsx_chunks(file, chunk_rows)
+    elif kind == "xls":
+        # The legacy format has no row-streaming reader, it is loaded in one go
+        df = pd.read_excel(file)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        yield from pd.read_csv(file, chunksize=chunk_rows)
+
+def read_statement(file):
+    """Read a whole (small) statement with the reader its content calls for."""
+    kind = sniff_format(file)
+    _rewind(file)
+    return pd.read_csv(file) if kind == "csv" else pd.read_excel(file)
+
+def categorize_chunks(chunks, matcher, desc_col=None, column="Categorization"):
+    """Add the category column to every chunk; the description column is detected on the first one."""
+    for chunk in chunks:
+        if desc_col is None:
+            desc_col = find_description_column(chunk.columns)
+            if not desc_col:
+                raise ValueError("No description column found in uploaded statement.")
+        chunk[column] = categorize_values(chunk[desc_col], matcher)
+        yield chunk
+
+def categorize_file(file, matcher, output_path, output_format=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Stream a statement through categorization into output_path; returns the row count.
+
+    Only one chunk is in memory at a time. output_format defaults to csv for
+    CSV input and xlsx for Excel input.
+    """
+    output_format = output_format or ("csv" if sniff_format(file) == "csv" else "xlsx")
+    chunks = categorize_chunks(read_chunks(file, chunk_rows), matcher)
+    if output_format == "csv":
+        return write_csv_chunks(chunks, output_path)
+    return write_xlsx_chunks(chunks, output_path)
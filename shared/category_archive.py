@@ -0,0 +1,224 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from shared.core import clean_text
+from shared.master_diff import diff_master
+from shared.matcher import compile_master, sheet_version
+
+# -------------------------------------
+# Archive of categorized descriptions, kept in sync with the master sheet
+# -------------------------------------
+
+ARCHIVE_PATH = os.environ.get("CATEGORY_ARCHIVE_PATH", "shared/cache/categories.sqlite")
+
+# Descriptions are indexed by character trigrams so a keyword finds the rows containing it
+GRAM_SIZE = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sheet (position INTEGER PRIMARY KEY, keyword TEXT, category TEXT);
+CREATE TABLE IF NOT EXISTS descriptions (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE, category TEXT);
+CREATE TABLE IF NOT EXISTS grams (
+    gram TEXT NOT NULL,
+    description_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, description_id)
+) WITHOUT ROWID;
+"""
+
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+def _stored(category):
+    # NaN categories from the sheet are stored as NULL
+    return None if category is None or category != category else str(category)
+
+
+class CategoryArchive:
+    """Distinct cleaned descriptions and their categories under one master sheet version.
+
+    When the sheet changes, sync() diffs it against the stored sheet and only
+    re-matches descriptions that contain an added, removed, moved or
+    recategorized keyword, found through the trigram index. The cost follows
+    the size of the change, not the size of the archive.
+    """
+
+    def __init__(self, path=ARCHIVE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    # ---------- Stored sheet ----------
+
+    @property
+    def version(self):
+        """Version of the master sheet the stored categories belong to, or None."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'sheet_version'").fetchone()
+        return row[0] if row else None
+
+    def stored_sheet(self):
+        rows = self._conn.execute("SELECT keyword, category FROM sheet ORDER BY position").fetchall()
+        return pd.DataFrame(rows, columns=['Key Word', 'Category'])
+
+    def _replace_sheet(self, master_df, version):
+        rows = [(i, keyword, _stored(category))
+                for i, (keyword, category) in enumerate(zip(master_df['Key Word'].tolist(), master_df['Category'].tolist()))]
+        self._conn.execute("DELETE FROM sheet")
+        self._conn.executemany("INSERT INTO sheet VALUES (?, ?, ?)", rows)
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('sheet_version', ?)", (version,))
+
+    # ---------- Lookups ----------
+
+    def _containing(self, keyword):
+        """(id, text) of stored descriptions that contain keyword."""
+        grams = sorted(_grams(keyword))
+        if not grams:
+            # Too short for the trigram index
+            return self._conn.execute(
+                "SELECT id, text FROM descriptions WHERE instr(text, ?) > 0", (keyword,)
+            ).fetchall()
+        placeholders = ",".join("?" * len(grams))
+        return self._conn.execute(
+            f"""SELECT d.id, d.text FROM descriptions d
+                JOIN (SELECT description_id FROM grams WHERE gram IN ({placeholders})
+                      GROUP BY description_id HAVING COUNT(*) = ?) g ON g.description_id = d.id
+                WHERE instr(d.text, ?) > 0""",
+            (*grams, len(grams), keyword),
+        ).fetchall()
+
+    def lookup(self, texts):
+        """Stored category of each cleaned text that is in the archive."""
+        found = {}
+        texts = list(texts)
+        for start in range(0, len(texts), 500):
+            batch = texts[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(
+                f"SELECT text, category FROM descriptions WHERE text IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    # ---------- Updates ----------
+
+    def sync(self, master_df, matcher=None):
+        """Bring stored categories up to date with master_df; returns what was done, with the changed {text: category} as updated."""
+        version = sheet_version(master_df['Key Word'].tolist(), master_df['Category'].tolist())
+        with self._lock, self._conn:
+            if self.version == version:
+                return {"version": version, "diff": None, "candidates": 0, "changed": 0, "updated": {}}
+
+            old_sheet = self.stored_sheet()
+            diff = diff_master(old_sheet, master_df)
+            matcher = matcher or compile_master(master_df)
+
+            candidates = {}
+            for keyword in diff.affected:
+                candidates.update(self._containing(keyword))
+
+            stored = self.lookup(candidates.values())
+            updated = {}
+            updates = []
+            for description_id, text in candidates.items():
+                category = _stored(matcher.match(text))
+                if category != stored.get(text):
+                    updated[text] = category
+                    updates.append((category, description_id))
+            self._conn.executemany("UPDATE descriptions SET category = ? WHERE id = ?", updates)
+
+            self._replace_sheet(master_df, version)
+            return {"version": version, "diff": diff, "candidates": len(candidates),
+                    "changed": len(updates), "updated": updated}
+
+    def add(self, texts, matcher):
+        """Store cleaned texts not yet in the archive, categorized with matcher; returns {text: category}."""
+        with self._lock, self._conn:
+            if self.version != matcher.version:
+                raise ValueError("Archive holds another master sheet version, call sync() first.")
+            texts = set(texts)
+            known = self.lookup(texts)
+            for text in texts - known.keys():
+                category = matcher.match(text)
+                cursor = self._conn.execute(
+                    "INSERT INTO descriptions (text, category) VALUES (?, ?)", (text, _stored(category))
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO grams VALUES (?, ?)",
+                    [(gram, cursor.lastrowid) for gram in _grams(text)],
+                )
+                known[text] = _stored(category)
+            return known
+
+    def categorize_values(self, values, master_df, matcher=None):
+        """Categorize a description column through the archive, storing new descriptions."""
+        matcher = matcher or compile_master(master_df)
+        self.sync(master_df, matcher)
+        values = pd.Series(values, dtype=object)
+        cleaned = values.map(clean_text)
+        codes, uniques = pd.factorize(cleaned)
+        known = self.add(uniques.tolist(), matcher)
+        categories = np.array([np.nan if known[text] is None else known[text] for text in uniques], dtype=object)
+        return categories[codes]
+
+
+@contextmanager
+def _opened(archive, store):
+    # Archive and store opened here are closed again; ones passed in are left open
+    from shared.transaction_store import TransactionStore
+
+    opened = [CategoryArchive() if archive is None else None, TransactionStore() if store is None else None]
+    try:
+        # An empty store is falsy (it has __len__), so test for None
+        yield (archive if archive is not None else opened[0]), (store if store is not None else opened[1])
+    finally:
+        for resource in opened:
+            if resource is not None:
+                resource.close()
+
+def categorize_stored(matcher, archive=None, store=None):
+    """Categorize stored transactions that have no category through the archive, adding their descriptions to it.
+
+    Returns the number of transactions categorized; 0 while the archive is
+    on another sheet version than matcher.
+    """
+    with _opened(archive, store) as (archive, store):
+        if archive.version != matcher.version:
+            return 0
+        return store.set_categories(archive.add(store.uncategorized_keys(), matcher), missing_only=True)
+
+def sync_transactions(master_df, matcher, archive=None, store=None):
+    """Sync the archive to a new master sheet and carry the changed categories over to the transaction store.
+
+    Stored transactions without a category yet are categorized too. Returns
+    the sync() report plus the rows changed in the store as stored.
+    """
+    with _opened(archive, store) as (archive, store):
+        report = archive.sync(master_df, matcher)
+        report["stored"] = store.set_categories(report["updated"]) + categorize_stored(matcher, archive, store)
+        return report
+
+if __name__ == "__main__":
+    # python -m shared.category_archive: bring the archive and stored transactions up to date with the current master sheet
+    from shared.master_cache import load_master_sheet
+
+    master_df = load_master_sheet()
+    report = sync_transactions(master_df, compile_master(master_df))
+    diff = report["diff"]
+    if diff is None:
+        print(f"Archive already on sheet version {report['version'][:12]}.")
+    else:
+        print(f"Sheet version {report['version'][:12]}: {len(diff.added)} added, {len(diff.removed)} removed, "
+              f"{len(diff.moved)} moved, {len(diff.recategorized)} recategorized keywords.")
+        print(f"Re-checked {report['candidates']} descriptions, {report['changed']} changed category.")
+    print(f"{report['stored']} stored transactions (re)categorized.")
@@ -1,25 +1,92 @@
+import numpy as np
 import pandas as pd
 import os
 import re
+import shutil
+import threading
+import time
+import uuid
+from shared.matcher import KeywordMatcher, compile_master
 
 # Master categorization sheet URL
 MASTER_SHEET_URL = "https://docs.google.com/spreadsheets/d/1I_Fz3slHP1mnfsKKgAFl54tKvqlo65Ug/export?format=xlsx"
 
-# Output CSV path for converted statement
-OUTPUT_FILE_PATH = "shared/outputs/converted_output.csv"
+# Per-session outputs of converted statements live under OUTPUT_DIR/<session_id>/
+OUTPUT_DIR = os.environ.get("CONVERTED_OUTPUT_DIR", "shared/outputs")
+OUTPUT_FILE_NAME = "converted.parquet"
+
+# Seconds after which an untouched session output is removed
+OUTPUT_TTL = float(os.environ.get("CONVERTED_OUTPUT_TTL", "86400"))
 
 # -------------------------------------
 # PDF Conversion Logic
 # -------------------------------------
 
-def save_converted_df(df, output_path=OUTPUT_FILE_PATH):
-    """Save the DataFrame from PDF conversion to a fixed CSV file."""
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False)
+def new_session_id():
+    """Return a fresh id for one user session or job."""
+    return uuid.uuid4().hex
+
+def _session_dir(session_id, output_dir=OUTPUT_DIR):
+    if not session_id or not re.fullmatch(r"[A-Za-z0-9_-]+", str(session_id)):
+        raise ValueError(f"Invalid session id: {session_id!r}")
+    return os.path.join(output_dir, str(session_id))
+
+def session_path(session_id, file_name, output_dir=OUTPUT_DIR):
+    """Path for a file in this session's output directory, which is created if needed."""
+    session_dir = _session_dir(session_id, output_dir)
+    os.makedirs(session_dir, exist_ok=True)
+    return os.path.join(session_dir, os.path.basename(file_name))
+
+def save_converted_df(df, session_id, output_dir=OUTPUT_DIR):
+    """Save the DataFrame or Arrow table from PDF conversion for this session only; returns the file path."""
+    import pyarrow.parquet as pq
+    from shared.interchange import to_transaction_table
+
+    session_dir = _session_dir(session_id, output_dir)
+    os.makedirs(session_dir, exist_ok=True)
+    output_path = os.path.join(session_dir, OUTPUT_FILE_NAME)
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        table = to_transaction_table(df) if isinstance(df, pd.DataFrame) else df
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    cleanup_stale_outputs(output_dir)
+    return output_path
+
+def get_converted_file(session_id, output_dir=OUTPUT_DIR):
+    """Return path to this session's converted file if it exists."""
+    output_path = os.path.join(_session_dir(session_id, output_dir), OUTPUT_FILE_NAME)
+    return output_path if os.path.exists(output_path) else None
 
-def get_converted_file():
-    """Return path to the converted CSV file if it exists."""
-    return OUTPUT_FILE_PATH if os.path.exists(OUTPUT_FILE_PATH) else None
+def load_converted_df(session_id, output_dir=OUTPUT_DIR):
+    """Return this session's converted DataFrame, or None if there is none."""
+    output_path = get_converted_file(session_id, output_dir)
+    return pd.read_parquet(output_path) if output_path else None
+
+def load_converted_table(session_id, output_dir=OUTPUT_DIR):
+    """Return this session's converted Arrow table (with its schema metadata), or None if there is none."""
+    import pyarrow.parquet as pq
+    output_path = get_converted_file(session_id, output_dir)
+    return pq.read_table(output_path) if output_path else None
+
+def cleanup_stale_outputs(output_dir=OUTPUT_DIR, ttl=OUTPUT_TTL):
+    """Remove session outputs not written for longer than ttl seconds; returns how many were removed."""
+    if not os.path.isdir(output_dir):
+        return 0
+    cutoff = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(output_dir):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path)
+                removed += 1
+        except OSError:
+            # Another session may be cleaning up at the same time
+            continue
+    return removed
 
 # -------------------------------------
 # Categorization Logic
@@ -30,11 +97,10 @@ def clean_text(text):
     return re.sub(r'\s+', ' ', str(text).lower().replace('–', '-').replace('—', '-')).strip()
 
 def load_master_file():
-    """Download and clean the master categorization sheet."""
+    """Return the cleaned master categorization sheet from the local snapshot cache."""
+    from shared.master_cache import load_master_sheet
     try:
-        df = pd.read_excel(MASTER_SHEET_URL)
-        df['Key Word'] = df['Key Word'].astype(str).apply(clean_text)
-        return df
+        return load_master_sheet()
     except Exception as e:
         raise RuntimeError(f"Failed to load master file: {e}")
 
@@ -43,19 +109,39 @@ def find_description_column(columns):
     possible = ['description', 'details', 'narration', 'particulars', 'transaction details', 'remarks']
     return next((col for col in columns if any(name in col.lower() for name in possible)), None)
 
-def categorize_description(description, master_df):
+def get_matcher(master):
+    """Return a compiled matcher for a master sheet DataFrame or an existing matcher."""
+    return master if isinstance(master, KeywordMatcher) else compile_master(master)
+
+def categorize_description(description, master):
     """Return category for a given description using the master sheet."""
-    cleaned = clean_text(description)
-    for _, row in master_df.iterrows():
-        if row['Key Word'] and row['Key Word'] in cleaned:
-            return row['Category']
-    return 'Uncategorized'
+    return get_matcher(master).match(clean_text(description))
+
+def categorize_unique(values, master):
+    """Categories for a list of distinct raw descriptions."""
+    matcher = get_matcher(master)
+    return [matcher.match(clean_text(value)) for value in values]
+
+def categorize_values(values, master):
+    """Categorize a column of descriptions, cleaning and matching each distinct value only once."""
+    values = pd.Series(values, dtype=object)
+    matcher = get_matcher(master)
+    codes, uniques = pd.factorize(values)
+    categories = np.array(categorize_unique(uniques, matcher), dtype=object)
+
+    result = np.empty(len(values), dtype=object)
+    present = codes >= 0
+    result[present] = categories[codes[present]]
+    # Missing values keep their own text (None -> 'none', NaN -> 'nan'), as with row-by-row matching
+    result[~present] = categorize_unique(values[~present], matcher)
+    return result
 
-def categorize_statement(statement_df, master_df):
+def categorize_statement(statement_df, master):
     """Categorize an entire statement DataFrame."""
     desc_col = find_description_column(statement_df.columns)
     if not desc_col:
         raise ValueError("No description column found in uploaded statement.")
-    statement_df['Categorization'] = statement_df[desc_col].apply(lambda x: categorize_description(x, master_df))
+    # A handful of labels repeated on every row
+    statement_df['Categorization'] = pd.Categorical(categorize_values(statement_df[desc_col], master))
     return statement_df
 
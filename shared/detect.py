@@ -0,0 +1,45 @@
+import re
+from functools import lru_cache
+
+# -------------------------------------
+# Statement format detection from the first page
+# -------------------------------------
+
+# Minimum fingerprint score for a confident match
+MIN_SCORE = 3
+
+
+def first_page_text(data):
+    """Lower-cased text of page one plus the document metadata, without touching later pages."""
+    import fitz  # PyMuPDF
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        parts = [value for value in (doc.metadata or {}).values() if value]
+        if doc.page_count:
+            parts.append(doc[0].get_text("text"))
+    return "\n".join(parts).lower()
+
+@lru_cache(maxsize=None)
+def _phrase_pattern(phrase):
+    # Whole words only, so "neo" does not match "neon" or "neom"
+    return re.compile(r"(?<!\w)" + re.escape(phrase.lower()) + r"(?!\w)")
+
+def score(text, fingerprints):
+    """Sum the weights of the (phrase, weight) fingerprints found as whole words in the lower-cased text."""
+    return sum(weight for phrase, weight in fingerprints if _phrase_pattern(phrase).search(text))
+
+def best_match(text, candidates, min_score=MIN_SCORE):
+    """Key of the highest scoring {key: fingerprints} candidate, or None if nothing scores min_score."""
+    best_key, best_score = None, min_score - 1
+    for key, fingerprints in candidates.items():
+        candidate_score = score(text, fingerprints)
+        if candidate_score > best_score:
+            best_key, best_score = key, candidate_score
+    return best_key
+
+def detect(data, candidates, min_score=MIN_SCORE):
+    """Detect which candidate format a PDF belongs to from its first page; None when unsure or unreadable."""
+    try:
+        text = first_page_text(data)
+    except Exception:
+        return None
+    return best_match(text, candidates, min_score)
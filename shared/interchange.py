@@ -0,0 +1,83 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from shared.core import categorize_unique, find_description_column
+
+# -------------------------------------
+# Arrow transaction table handed from the converter to the categorizer
+# -------------------------------------
+
+# Schema metadata keys
+DESCRIPTION_KEY = b"description_column"
+SOURCE_KEY = b"source"
+
+CATEGORY_COLUMN = "Categorization"
+
+
+# inferred object-column kinds Arrow converts as they are
+_ARROW_NATIVE = ("string", "empty", "boolean", "date", "datetime", "bytes")
+_NUMERIC = ("integer", "floating", "mixed-integer-float", "decimal")
+
+def _typed_frame(df):
+    """Give every column one Arrow-compatible type: numbers stay numeric, mixed text and numbers become strings."""
+    df = df.rename(columns=str)
+    casts = {}
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind in _NUMERIC:
+            casts[col] = pd.to_numeric(df[col])
+        elif kind not in _ARROW_NATIVE:
+            casts[col] = df[col].astype("string")
+    return df.assign(**casts) if casts else df
+
+def to_transaction_table(df, description_column=None, source="pdf_app"):
+    """Convert a parser's DataFrame into a typed Arrow table.
+
+    The description column is detected once here and recorded in the schema
+    metadata, so consumers do not need to look for it again.
+    """
+    df = _typed_frame(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    description_column = description_column or find_description_column(df.columns)
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_KEY] = source.encode("utf-8")
+    if description_column:
+        metadata[DESCRIPTION_KEY] = description_column.encode("utf-8")
+    return table.replace_schema_metadata(metadata)
+
+def description_column(table):
+    """Description column recorded in the table, falling back to detection by name."""
+    recorded = (table.schema.metadata or {}).get(DESCRIPTION_KEY)
+    if recorded and recorded.decode("utf-8") in table.column_names:
+        return recorded.decode("utf-8")
+    return find_description_column(table.column_names)
+
+def append_column(table, name, values):
+    """Add (or replace) one column; the existing columns' buffers are shared, not copied."""
+    array = values if isinstance(values, (pa.Array, pa.ChunkedArray)) else pa.array(values, type=pa.string())
+    if name in table.column_names:
+        return table.set_column(table.column_names.index(name), name, array)
+    return table.append_column(name, array)
+
+def categorize_table(table, matcher, column=CATEGORY_COLUMN):
+    """Return a new table with a category column for the recorded description column."""
+    desc_col = description_column(table)
+    if not desc_col:
+        raise ValueError("No description column found in uploaded statement.")
+    # Classify each distinct description once and keep the result dictionary-encoded
+    encoded = table.column(desc_col).combine_chunks().dictionary_encode()
+    labels = categorize_unique(encoded.dictionary.to_pylist(), matcher)
+    indices = encoded.indices
+    if indices.null_count:
+        labels.append(categorize_unique([None], matcher)[0])
+        indices = pc.fill_null(indices, len(labels) - 1)
+    categories = pa.DictionaryArray.from_arrays(indices, pa.array(labels, type=pa.string()))
+    return append_column(table, column, categories)
+
+def to_frame(table):
+    """pandas view of a transaction table for display and export."""
+    return table.to_pandas()
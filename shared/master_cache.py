@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import time
+import urllib.request
+from io import BytesIO
+from urllib.error import HTTPError, URLError
+
+import pandas as pd
+
+from shared.core import MASTER_SHEET_URL, clean_text
+
+# -------------------------------------
+# Local snapshot of the master categorization sheet
+# -------------------------------------
+
+# Directory holding the parquet snapshot and its metadata
+CACHE_DIR = os.environ.get("MASTER_CACHE_DIR", "shared/cache")
+
+# Seconds a snapshot is trusted before the sheet is revalidated
+CACHE_TTL = float(os.environ.get("MASTER_CACHE_TTL", "3600"))
+
+# Never touch the network, always use the last good snapshot
+OFFLINE = os.environ.get("MASTER_SHEET_OFFLINE", "").lower() in ("1", "true", "yes")
+
+SNAPSHOT_NAME = "master_sheet.parquet"
+META_NAME = "master_sheet.json"
+# Recent distinct sheets, kept as <sha256>.parquet for diffing
+VERSIONS_DIR = "versions"
+
+# Sheet versions kept in VERSIONS_DIR; older ones are deleted as new ones arrive
+VERSIONS_KEEP = max(2, int(os.environ.get("MASTER_VERSIONS_KEEP", "10")))
+REQUEST_TIMEOUT = 30
+
+
+def _paths(cache_dir):
+    return os.path.join(cache_dir, SNAPSHOT_NAME), os.path.join(cache_dir, META_NAME)
+
+def _atomic_write(path, write):
+    """Write via a temporary file and rename so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def read_meta(cache_dir=CACHE_DIR):
+    """Return snapshot metadata, or an empty dict when there is no usable snapshot."""
+    snapshot_path, meta_path = _paths(cache_dir)
+    if not (os.path.exists(snapshot_path) and os.path.exists(meta_path)):
+        return {}
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_meta(meta, cache_dir):
+    _, meta_path = _paths(cache_dir)
+
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    _atomic_write(meta_path, write)
+
+def read_snapshot(cache_dir=CACHE_DIR):
+    """Load the cached master sheet; the Key Word column is already cleaned."""
+    snapshot_path, _ = _paths(cache_dir)
+    return pd.read_parquet(snapshot_path)
+
+def _version_path(version, cache_dir):
+    return os.path.join(cache_dir, VERSIONS_DIR, f"{version}.parquet")
+
+def list_versions(cache_dir=CACHE_DIR):
+    """Archived sheet versions (sha256 of the download), oldest first."""
+    versions_dir = os.path.join(cache_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    entries = [entry for entry in os.scandir(versions_dir) if entry.name.endswith(".parquet")]
+    return [entry.name[:-len(".parquet")] for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime)]
+
+def read_version(version, cache_dir=CACHE_DIR):
+    """Load one archived sheet version, or None if it was never stored."""
+    path = _version_path(version, cache_dir)
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+def prune_versions(keep=VERSIONS_KEEP, cache_dir=CACHE_DIR):
+    """Delete all but the keep most recent archived sheet versions; returns the deleted versions."""
+    versions = list_versions(cache_dir)
+    stale = versions[:max(0, len(versions) - keep)]
+    for version in stale:
+        try:
+            os.remove(_version_path(version, cache_dir))
+        except FileNotFoundError:
+            pass
+    return stale
+
+def parse_master_sheet(content):
+    """Parse downloaded xlsx bytes into the cleaned master sheet frame."""
+    df = pd.read_excel(BytesIO(content))
+    df = df[['Key Word', 'Category']].copy()
+    df['Key Word'] = df['Key Word'].astype(str).apply(clean_text)
+    df['Category'] = df['Category'].where(df['Category'].isna(), df['Category'].astype(str))
+    return df.reset_index(drop=True)
+
+def _fetch(url, meta):
+    """Conditionally download the sheet. Returns bytes and headers, or (None, headers) on 304."""
+    request = urllib.request.Request(url)
+    if meta.get("etag"):
+        request.add_header("If-None-Match", meta["etag"])
+    if meta.get("last_modified"):
+        request.add_header("If-Modified-Since", meta["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return response.read(), response.headers
+    except HTTPError as e:
+        if e.code == 304:
+            return None, e.headers
+        raise
+
+def load_master_sheet(url=MASTER_SHEET_URL, cache_dir=CACHE_DIR, ttl=CACHE_TTL, offline=OFFLINE, force=False):
+    """Return the cleaned master sheet, downloading it only when the snapshot is stale.
+
+    A fresh snapshot is returned as is. A stale one is revalidated with
+    ETag / Last-Modified and a content hash, so an unchanged sheet is never
+    parsed again. If the download fails, the last good snapshot is used.
+    """
+    meta = read_meta(cache_dir)
+    now = time.time()
+
+    if meta and (offline or (not force and now - meta.get("fetched_at", 0) < ttl)):
+        return read_snapshot(cache_dir)
+    if offline:
+        raise RuntimeError("Master sheet offline mode is on but no local snapshot exists.")
+
+    try:
+        content, headers = _fetch(url, meta)
+    except (URLError, OSError) as e:
+        if meta:
+            return read_snapshot(cache_dir)
+        raise RuntimeError(f"Failed to download master file: {e}")
+
+    digest = hashlib.sha256(content).hexdigest() if content is not None else meta.get("sha256")
+    new_meta = {
+        "url": url,
+        "fetched_at": now,
+        "etag": headers.get("ETag") or meta.get("etag"),
+        "last_modified": headers.get("Last-Modified") or meta.get("last_modified"),
+        "sha256": digest,
+        "previous_sha256": meta.get("previous_sha256"),
+    }
+
+    if meta and digest == meta.get("sha256"):
+        _write_meta(new_meta, cache_dir)
+        return read_snapshot(cache_dir)
+
+    df = parse_master_sheet(content)
+    os.makedirs(os.path.join(cache_dir, VERSIONS_DIR), exist_ok=True)
+    snapshot_path, _ = _paths(cache_dir)
+    _atomic_write(_version_path(digest, cache_dir), lambda path: df.to_parquet(path, index=False))
+    _atomic_write(snapshot_path, lambda path: df.to_parquet(path, index=False))
+    new_meta["previous_sha256"] = meta.get("sha256")
+    _write_meta(new_meta, cache_dir)
+    prune_versions(cache_dir=cache_dir)
+    return df
@@ -0,0 +1,107 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+# -------------------------------------
+# Differences between two master sheet versions
+# -------------------------------------
+
+
+class MasterDiff(namedtuple("MasterDiff", ["added", "removed", "moved", "recategorized"])):
+    """Keywords whose change can alter the category of a description containing them."""
+    __slots__ = ()
+
+    @property
+    def affected(self):
+        """Every keyword a description must contain for its category to possibly change."""
+        return sorted(set(self.added) | set(self.removed) | set(self.moved) | set(self.recategorized))
+
+    @property
+    def empty(self):
+        return not (self.added or self.removed or self.moved or self.recategorized)
+
+
+def keyword_entries(master_df):
+    """Effective (keyword, category) entries in sheet order.
+
+    Only the first row of a repeated keyword can ever win a match, and empty
+    keywords never match, so both are dropped.
+    """
+    entries = {}
+    for keyword, category in zip(master_df['Key Word'].tolist(), master_df['Category'].tolist()):
+        if keyword and keyword not in entries:
+            entries[keyword] = category
+    return list(entries.items())
+
+def _longest_increasing(positions):
+    """Indexes into positions forming one longest strictly increasing subsequence."""
+    tails, tail_index, previous = [], [], [-1] * len(positions)
+    for i, value in enumerate(positions):
+        slot = bisect_left(tails, value)
+        if slot == len(tails):
+            tails.append(value)
+            tail_index.append(i)
+        else:
+            tails[slot] = value
+            tail_index[slot] = i
+        previous[i] = tail_index[slot - 1] if slot else -1
+
+    keep = []
+    i = tail_index[-1] if tail_index else -1
+    while i != -1:
+        keep.append(i)
+        i = previous[i]
+    return keep[::-1]
+
+def _same(left, right):
+    # Missing categories come back as NaN, which never equals itself
+    return left == right or (left != left and right != right)
+
+def diff_master(old_df, new_df):
+    """Compare two cleaned master sheets.
+
+    A description's category is decided by the earliest keyword it contains.
+    It can only change when it contains a keyword that was added, removed or
+    recategorized, or one whose order relative to other kept keywords changed.
+    Keywords outside one longest run of kept keywords still in their old order
+    count as moved, so a single moved row does not flag the whole sheet.
+    """
+    old_entries = keyword_entries(old_df)
+    new_entries = keyword_entries(new_df)
+    old_position = {keyword: i for i, (keyword, _) in enumerate(old_entries)}
+    old_category = dict(old_entries)
+    new_keywords = {keyword for keyword, _ in new_entries}
+
+    added = [keyword for keyword, _ in new_entries if keyword not in old_position]
+    removed = [keyword for keyword, _ in old_entries if keyword not in new_keywords]
+    recategorized = [keyword for keyword, category in new_entries
+                     if keyword in old_position and not _same(category, old_category[keyword])]
+
+    kept = [keyword for keyword, _ in new_entries if keyword in old_position]
+    in_order = {kept[i] for i in _longest_increasing([old_position[keyword] for keyword in kept])}
+    moved = [keyword for keyword in kept if keyword not in in_order]
+
+    return MasterDiff(added, removed, moved, recategorized)
+
+
+if __name__ == "__main__":
+    # python -m shared.master_diff [OLD [NEW]]: keyword changes between two archived sheet versions,
+    # by default the previous and the current one
+    import sys
+
+    from shared.master_cache import list_versions, read_meta, read_version
+
+    meta = read_meta()
+    old_version, new_version = (sys.argv[1:] + [None, None])[:2]
+    old_version = old_version or meta.get("previous_sha256")
+    new_version = new_version or meta.get("sha256")
+    old_df = read_version(old_version) if old_version else None
+    new_df = read_version(new_version) if new_version else None
+    if old_df is None or new_df is None:
+        print("Archived versions (oldest first):")
+        for version in list_versions():
+            print(f"  {version}")
+        sys.exit("Both sheet versions must be archived to diff them.")
+
+    diff = diff_master(old_df, new_df)
+    for label, keywords in zip(diff._fields, diff):
+        print(f"{label} ({len(keywords)}): {', '.join(keywords[:20])}{' ...' if len(keywords) > 20 else ''}")
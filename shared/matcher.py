@@ -0,0 +1,125 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict, deque
+
+# -------------------------------------
+# Compiled keyword matcher (Aho-Corasick)
+# -------------------------------------
+
+UNCATEGORIZED = 'Uncategorized'
+
+# Cleaned description -> category results remembered per master sheet version
+MEMO_MAX_ENTRIES = int(os.environ.get("CATEGORY_MEMO_MAX", "500000"))
+MEMO_VERSIONS = 4
+
+_memos = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def sheet_version(keywords, categories, default=UNCATEGORIZED):
+    """Content hash of a master sheet; equal sheets give equal versions."""
+    digest = hashlib.sha256(repr(default).encode("utf-8"))
+    for keyword, category in zip(keywords, categories):
+        digest.update(repr((keyword, category)).encode("utf-8"))
+    return digest.hexdigest()
+
+def memo_for(version):
+    """Shared result memo of one sheet version; only the most recent versions are kept."""
+    with _memo_lock:
+        memo = _memos.get(version)
+        if memo is None:
+            memo = _memos[version] = {}
+            while len(_memos) > MEMO_VERSIONS:
+                _memos.popitem(last=False)
+        else:
+            _memos.move_to_end(version)
+        return memo
+
+
+class KeywordMatcher:
+    """Multi-pattern substring matcher over the master sheet keywords.
+
+    Keywords are compiled once into an Aho-Corasick automaton, so matching a
+    description is a single pass over its text. When several keywords occur
+    in the text the one listed first in the sheet wins, exactly like the old
+    row-by-row scan of the master sheet.
+    """
+
+    def __init__(self, keywords, categories, default=UNCATEGORIZED):
+        keywords = list(keywords)
+        self.default = default
+        self.categories = list(categories)
+        self.version = sheet_version(keywords, self.categories, default)
+        self._memo = memo_for(self.version)
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+
+        for index, keyword in enumerate(keywords):
+            if keyword:
+                self._add(keyword, index)
+        self._link()
+
+    def _add(self, keyword, index):
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            state = nxt
+        # Keep the earliest sheet row for duplicate keywords
+        if self._best[state] is None or index < self._best[state]:
+            self._best[state] = index
+
+    def _link(self):
+        """Build failure links and fold suffix matches into each state."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+
+                inherited = self._best[self._fail[nxt]]
+                if inherited is not None and (self._best[nxt] is None or inherited < self._best[nxt]):
+                    self._best[nxt] = inherited
+                queue.append(nxt)
+
+    def first_match(self, text):
+        """Return the sheet index of the earliest keyword found in text, or None."""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        state = 0
+        best = None
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found = best_at[state]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return best
+
+    def match(self, text):
+        """Return the category for already-cleaned text."""
+        category = self._memo.get(text)
+        if category is None:
+            index = self.first_match(text)
+            category = self.default if index is None else self.categories[index]
+            if len(self._memo) < MEMO_MAX_ENTRIES:
+                self._memo[text] = category
+        return category
+
+
+def compile_master(master_df):
+    """Compile the cleaned master sheet into a KeywordMatcher."""
+    return KeywordMatcher(master_df['Key Word'].tolist(), master_df['Category'].tolist())
@@ -0,0 +1,91 @@
+import sys
+import threading
+import time
+
+from shared.master_cache import CACHE_TTL, load_master_sheet, read_meta
+from shared.matcher import compile_master
+
+# -------------------------------------
+# One compiled master-sheet matcher per process
+# -------------------------------------
+
+
+class SharedMatcher:
+    """Process-wide compiled matcher, shared read-only by every session and request.
+
+    The sheet snapshot is revalidated at most once per ttl by a single
+    thread; everyone else keeps using the current matcher meanwhile. A new
+    matcher is compiled only when the sheet's content hash changes, and is
+    published with one reference swap, so readers see either the old or the
+    new version, never a half-built one. on_change(master, matcher) is then
+    called by the refreshing thread.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, loader=load_master_sheet, on_change=None):
+        self.ttl = ttl
+        self.loader = loader
+        self.on_change = on_change
+        self._current = None  # (version, matcher)
+        self._checked_at = 0
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Content hash of the sheet behind the current matcher, or None before the first load."""
+        current = self._current
+        return current[0] if current else None
+
+    def _refresh(self):
+        master = self.loader()
+        version = read_meta().get("sha256")
+        current = self._current
+        if current is None or current[0] != version or version is None:
+            matcher = compile_master(master)
+            self._current = (version, matcher)
+            if self.on_change is not None:
+                try:
+                    self.on_change(master, matcher)
+                except Exception as e:
+                    # The new matcher is already live; a failed hook is retried with the next version
+                    print(f"Master sheet change hook failed: {type(e).__name__}: {e}", file=sys.stderr)
+        self._checked_at = time.time()
+
+    def get(self):
+        """Return the current matcher, refreshing it first when the snapshot is due for a check."""
+        current = self._current
+        if current is not None and time.time() - self._checked_at < self.ttl:
+            return current[1]
+
+        if current is None:
+            # Nothing to serve yet: wait for whoever is loading the first version
+            with self._refresh_lock:
+                if self._current is None:
+                    self._refresh()
+                return self._current[1]
+
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            except Exception:
+                # Keep serving the last good matcher; retry after another ttl
+                self._checked_at = time.time()
+            finally:
+                self._refresh_lock.release()
+        return self._current[1]
+
+
+def _sync_categories(master, matcher):
+    # Archived descriptions and stored transactions follow every new sheet version
+    from shared.category_archive import sync_transactions
+    sync_transactions(master, matcher)
+
+_shared = SharedMatcher(on_change=_sync_categories)
+
+
+def get_matcher():
+    """The process-wide compiled matcher; sessions should keep only this reference."""
+    return _shared.get()
+
+def matcher_version():
+    """Sheet content hash of the process-wide matcher, or None if not loaded yet."""
+    return _shared.version
@@ -0,0 +1,49 @@
+import unicodedata
+
+# -------------------------------------
+# Text normalization for extracted statement cells
+# -------------------------------------
+
+ARABIC_INDIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+def _build_table():
+    table = dict(ARABIC_INDIC_DIGITS)
+    # Arabic decimal and thousands separators
+    table[ord("٫")] = "."
+    table[ord("٬")] = ","
+    # Hyphen, non-breaking hyphen, figure dash, en/em dash, horizontal bar, minus sign
+    for dash in "‐‑‒–—―−":
+        table[ord(dash)] = "-"
+    # Arabic presentation forms (as emitted by some PDF text layers) to their base letters
+    for start, stop in ((0xFB50, 0xFE00), (0xFE70, 0xFF00)):
+        for code in range(start, stop):
+            char = chr(code)
+            base = unicodedata.normalize("NFKC", char)
+            if base != char and base.strip():
+                # Isolated and tatweel forms of harakat decompose to a space or
+                # tatweel plus the mark; keep only the mark so no space lands inside words
+                table[code] = base.lstrip(" \u0640") or base
+    return table
+
+# One translation table for digits, dashes and presentation forms
+TRANSLATION_TABLE = _build_table()
+
+
+def normalize_text(text):
+    """Normalize a single string with TRANSLATION_TABLE."""
+    return text.translate(TRANSLATION_TABLE)
+
+def normalize_series(series):
+    """Normalize a whole column; missing values are left untouched."""
+    present = series.notna()
+    if not present.any():
+        return series
+    result = series.astype(object)
+    result[present] = series[present].astype(str).str.translate(TRANSLATION_TABLE)
+    return result
+
+def normalize_frame(df, columns=None):
+    """Normalize the given columns (default: all) of a DataFrame in place and return it."""
+    for col in columns if columns is not None else df.columns:
+        df[col] = normalize_series(df[col])
+    return df
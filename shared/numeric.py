@@ -0,0 +1,44 @@
+import re
+
+import pandas as pd
+
+# -------------------------------------
+# Vectorized amount / balance parsing
+# -------------------------------------
+
+
+def _single_group(pattern):
+    """Compile pattern so that it has exactly one capture group, as str.extractall expects."""
+    pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+    return pattern if pattern.groups == 1 else re.compile(f"({pattern.pattern})", pattern.flags)
+
+def nth_matches(series, pattern, positions):
+    """Pick regex matches by position for every row in a single extractall pass.
+
+    positions follow list indexing (0 = first match, -1 = last match), so
+    the result is what re.findall(pattern, text)[position] gives per row.
+    Returns a DataFrame with one column per position; rows without such a
+    match get ''.
+    """
+    values = series.reset_index(drop=True)
+    matches = values.str.extractall(_single_group(pattern))[0]
+
+    order = matches.index.get_level_values("match")
+    count = matches.groupby(level=0).transform("size").to_numpy()
+
+    picked = {}
+    for position in positions:
+        wanted = position if position >= 0 else count + position
+        selected = matches[order == wanted]
+        selected.index = selected.index.droplevel("match")
+        picked[position] = selected.reindex(values.index, fill_value="").to_numpy()
+
+    return pd.DataFrame(picked, index=series.index)
+
+def strip_thousands(series):
+    """Remove thousands separators from amount strings."""
+    return series.str.replace(",", "", regex=False)
+
+def to_number(series):
+    """Amount strings such as '1,234.50' to floats; blanks become NaN."""
+    return pd.to_numeric(strip_thousands(series), errors="coerce")
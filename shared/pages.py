@@ -0,0 +1,49 @@
+import os
+
+from shared.parallel import in_worker, run_tasks
+
+# -------------------------------------
+# Page-range parallelism for very large statements
+# -------------------------------------
+
+# Statements with at least this many pages are split across workers (0 disables)
+PAGE_SPLIT_THRESHOLD = int(os.environ.get("PDF_PAGE_SPLIT_THRESHOLD", "100"))
+
+# Pages handed to one worker at a time
+PAGE_CHUNK_SIZE = int(os.environ.get("PDF_PAGE_CHUNK_SIZE", "25"))
+
+
+def page_count(data):
+    """Number of pages in a PDF given as bytes."""
+    import fitz  # PyMuPDF opens only the xref here, much cheaper than a full parse
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return doc.page_count
+
+def page_ranges(n_pages, chunk_size=PAGE_CHUNK_SIZE):
+    """Split n_pages into consecutive (start, stop) ranges."""
+    chunk_size = max(1, chunk_size)
+    return [(start, min(start + chunk_size, n_pages)) for start in range(0, n_pages, chunk_size)]
+
+def map_pages(page_fn, data, threshold=None, chunk_size=None, workers=None):
+    """Run page_fn(data, start, stop) over the PDF and concatenate the outputs in page order.
+
+    page_fn must return a list of per-page items (lines, rows or tables);
+    stop=None means "through the last page".
+    Grouping that spans pages, such as multi-line transactions, is left to
+    the caller and done on the merged list, so page boundaries never split
+    a transaction. Small files and calls made inside a worker run in-process.
+    """
+    threshold = PAGE_SPLIT_THRESHOLD if threshold is None else threshold
+    if not threshold or in_worker():
+        return page_fn(data, 0, None)
+    n_pages = page_count(data)
+    if n_pages < threshold:
+        return page_fn(data, 0, None)
+
+    ranges = page_ranges(n_pages, chunk_size or PAGE_CHUNK_SIZE)
+    merged = []
+    for (start, stop), (result, error) in zip(ranges, run_tasks(page_fn, [(data, start, stop) for start, stop in ranges], workers)):
+        if error is not None:
+            raise RuntimeError(f"Failed to extract pages {start + 1}-{stop}: {error}")
+        merged.extend(result)
+    return merged
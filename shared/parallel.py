@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import sys
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from shared import pdf_cache
+
+# -------------------------------------
+# Parallel extraction of uploaded statements
+# -------------------------------------
+
+# Worker processes used for PDF parsing (1 disables the pool)
+MAX_WORKERS = int(os.environ.get("PDF_WORKERS", "0")) or os.cpu_count() or 1
+
+# Optional multiprocessing start method ("fork", "spawn", "forkserver")
+START_METHOD = os.environ.get("PDF_MP_START_METHOD") or None
+
+# Set inside worker processes so nested calls stay serial
+_WORKER_FLAG = "PDF_PARALLEL_WORKER"
+
+FileResult = namedtuple("FileResult", ["name", "result", "error"])
+
+# Long-lived pools by name, shared by all callers once warm_pool() is called (e.g. by a service)
+DEFAULT_POOL = "default"
+_pools = {}
+_pool_workers = {}
+_pool_lock = threading.Lock()
+
+# Name of the pool run_tasks uses in the current thread, see use_pool()
+_local = threading.local()
+
+
+def in_worker():
+    """True when running inside one of our pool workers."""
+    return os.environ.get(_WORKER_FLAG) == "1"
+
+def _init_worker(parent_path):
+    # Bank modules are imported as top-level modules from pdf_app/, mirror the parent's path
+    for path in reversed(parent_path):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    os.environ[_WORKER_FLAG] = "1"
+
+def _call(fn, args):
+    try:
+        return fn(*args), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _new_pool(workers):
+    context = multiprocessing.get_context(START_METHOD) if START_METHOD else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=_init_worker, initargs=(list(sys.path),))
+
+def warm_pool(workers=None, name=DEFAULT_POOL):
+    """Start a persistent worker pool that run_tasks reuses until shutdown_pool().
+
+    Worker start-up and module imports are then paid once instead of per batch.
+    Several named pools can be kept, each with its own workers; use_pool()
+    picks the one a thread's tasks go to. Named pools start even with one
+    worker, so their callers' parsing still leaves the calling thread.
+    """
+    with _pool_lock:
+        if name not in _pools and ((workers or MAX_WORKERS) > 1 or name != DEFAULT_POOL):
+            _pools[name] = _new_pool(workers or MAX_WORKERS)
+            _pool_workers[name] = workers or MAX_WORKERS
+        return _pools.get(name)
+
+def shutdown_pool(name=None):
+    """Stop one persistent pool, or all of them."""
+    with _pool_lock:
+        names = list(_pools) if name is None else [name]
+        pools = [_pools.pop(key) for key in names if key in _pools]
+        for key in names:
+            _pool_workers.pop(key, None)
+    for pool in pools:
+        pool.shutdown()
+
+@contextmanager
+def use_pool(name, workers=None):
+    """Send run_tasks calls made in this thread to the named pool.
+
+    workers caps the processes of this thread's batches when that pool is
+    not running, so a worker budget holds without it too.
+    """
+    previous = (getattr(_local, "pool", DEFAULT_POOL), getattr(_local, "workers", None))
+    _local.pool, _local.workers = name, workers
+    try:
+        yield
+    finally:
+        _local.pool, _local.workers = previous
+
+def _discard_pool(pool):
+    # A crashed worker breaks the whole executor; the next warm_pool() call starts a fresh one
+    with _pool_lock:
+        for name, current in list(_pools.items()):
+            if current is pool:
+                del _pools[name]
+                _pool_workers.pop(name, None)
+    pool.shutdown(wait=False)
+
+def pool_slots(workers=None):
+    """Tasks run_tasks would run at once in worker processes from this thread; 0 when it would run them in the thread."""
+    if in_worker():
+        return 0
+    name = getattr(_local, "pool", DEFAULT_POOL)
+    if name in _pools:
+        return _pool_workers[name]
+    slots = min(workers or MAX_WORKERS, getattr(_local, "workers", None) or MAX_WORKERS)
+    return slots if slots > 1 else 0
+
+def _collect(pool, fn, tasks):
+    futures = [pool.submit(_call, fn, args) for args in tasks]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result())
+        except BrokenProcessPool as e:
+            outcomes.append((None, f"Worker crashed: {e}"))
+    return outcomes
+
+def run_tasks(fn, tasks, workers=None):
+    """Run fn(*args) for each args tuple, in a process pool when it pays off.
+
+    Returns (result, error) pairs in the order of tasks. Exceptions are
+    reported per task instead of aborting the whole batch.
+    """
+    tasks = list(tasks)
+    shared_pool = _pools.get(getattr(_local, "pool", DEFAULT_POOL))
+    if tasks and shared_pool is not None and not in_worker():
+        try:
+            return _collect(shared_pool, fn, tasks)
+        except (BrokenProcessPool, RuntimeError):
+            # Broken or shut down while submitting, fall back to a one-off pool
+            _discard_pool(shared_pool)
+
+    workers = min(workers or MAX_WORKERS, getattr(_local, "workers", None) or MAX_WORKERS, len(tasks))
+    if workers <= 1 or in_worker():
+        return [_call(fn, args) for args in tasks]
+
+    try:
+        with _new_pool(workers) as pool:
+            return _collect(pool, fn, tasks)
+    except (OSError, NotImplementedError):
+        # No process support in this environment, fall back to serial
+        return [_call(fn, args) for args in tasks]
+
+def parse_jobs(jobs, workers=None):
+    """Run (parser, version, parse_fn, file) jobs, reusing cached results.
+
+    Jobs may mix different bank parsers. Cache misses are spread over the
+    process pool, and results come back as FileResult tuples in job order.
+    Files given as paths are only hashed here and read by the task that
+    parses them, so a large batch is never held in memory at once.
+    """
+    results = [None] * len(jobs)
+    pending = []
+    for i, (parser, version, parse_fn, file) in enumerate(jobs):
+        name = pdf_cache.file_name(file)
+        key = pdf_cache.file_key(file, parser, version)
+        cached = pdf_cache.get(key)
+        if cached is not None:
+            results[i] = FileResult(name, cached, None)
+        else:
+            pending.append((i, key, parse_fn, name, file))
+
+    tasks = [(parse_fn, _task_file(file), name) for _, _, parse_fn, name, file in pending]
+    outcomes = run_tasks(_call_parser, tasks, workers)
+    for (i, key, _, name, _), (result, error) in zip(pending, outcomes):
+        if error is None:
+            pdf_cache.put(key, result)
+        results[i] = FileResult(name, result, error)
+    return results
+
+def _task_file(file):
+    # Paths go to the worker as they are; uploads are already in memory and are sent as bytes
+    return file if isinstance(file, (str, os.PathLike)) else pdf_cache.file_bytes(file)
+
+def _call_parser(parse_fn, file, name):
+    return parse_fn(pdf_cache.file_bytes(file), name)
+
+def parse_files(parser, version, parse_fn, files, workers=None):
+    """Parse uploaded files of one bank with parse_fn(data, filename); see parse_jobs."""
+    return parse_jobs([(parser, version, parse_fn, file) for file in files], workers)
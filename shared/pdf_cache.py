@@ -0,0 +1,124 @@
+import copy
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# -------------------------------------
+# Content-hash cache of parsed PDF results
+# -------------------------------------
+
+# Upper bound for the estimated size of all cached results
+MAX_CACHE_BYTES = int(float(os.environ.get("PDF_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+# Block size for hashing files on disk without reading them whole
+HASH_BLOCK_BYTES = 1024 * 1024
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_total_bytes = 0
+
+
+def file_bytes(file):
+    """Return the raw bytes of an uploaded file, file-like object, bytes or path."""
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            return f.read()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    data = file.read()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return data
+
+def file_name(file, default="uploaded.pdf"):
+    """Return the display name of an uploaded file or path."""
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.basename(file)
+    return getattr(file, "name", None) or default
+
+def content_key(data, parser, version, filename):
+    """Cache key for one file parsed by one version of a bank parser.
+
+    Parsers write the file name into their rows (Source File), so the same
+    bytes uploaded under another name are a different entry.
+    """
+    return (hashlib.sha256(data).hexdigest(), parser, str(version), filename)
+
+def file_digest(file):
+    """sha256 of a file's content; paths are hashed block by block instead of being loaded."""
+    if isinstance(file, (str, os.PathLike)):
+        digest = hashlib.sha256()
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    return hashlib.sha256(file_bytes(file)).hexdigest()
+
+def file_key(file, parser, version):
+    """content_key() of an uploaded file or path, without keeping its bytes."""
+    return (file_digest(file), parser, str(version), file_name(file))
+
+def _result_size(result):
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    try:
+        return len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+def _copy(result):
+    # Callers add columns and mutate frames in place, never hand out the cached object
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    return copy.deepcopy(result)
+
+def get(key):
+    """Return a copy of a cached result, or None on a miss."""
+    with _lock:
+        if key not in _cache:
+            return None
+        _cache.move_to_end(key)
+        result, _ = _cache[key]
+    return _copy(result)
+
+def put(key, result):
+    """Store a result and evict least recently used entries beyond MAX_CACHE_BYTES."""
+    global _total_bytes
+    size = _result_size(result)
+    if size > MAX_CACHE_BYTES:
+        return
+    result = _copy(result)
+    with _lock:
+        if key in _cache:
+            _total_bytes -= _cache.pop(key)[1]
+        _cache[key] = (result, size)
+        _total_bytes += size
+        while _total_bytes > MAX_CACHE_BYTES and _cache:
+            _, (_, evicted) = _cache.popitem(last=False)
+            _total_bytes -= evicted
+
+def clear():
+    """Drop every cached result."""
+    global _total_bytes
+    with _lock:
+        _cache.clear()
+        _total_bytes = 0
+
+def cached_parse(parser, version, parse_fn, file):
+    """Run parse_fn(data, filename) for an uploaded file unless the same content was already parsed."""
+    data = file_bytes(file)
+    name = file_name(file)
+    key = content_key(data, parser, version, name)
+    result = get(key)
+    if result is None:
+        result = parse_fn(data, name)
+        put(key, result)
+    return result
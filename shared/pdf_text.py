@@ -0,0 +1,122 @@
+import os
+import sys
+from contextlib import contextmanager
+from io import BytesIO
+
+import pandas as pd
+
+# -------------------------------------
+# Interchangeable PDF text extraction backends
+# -------------------------------------
+
+BACKENDS = ("pymupdf", "pdfplumber", "pypdf2")
+
+# Engine each text-based parser was written and validated against.
+# Switch a bank to a faster engine only after check_parity() agrees on real statements.
+DEFAULT_BACKENDS = {
+    "fab_bank": "pypdf2",
+    "mashreq": "pypdf2",
+    "Wio_bank": "pdfplumber",
+    "Rak_Bank": "pymupdf",
+    "adib_bank": "pymupdf",
+}
+
+
+def _pymupdf_pages(data, start, stop):
+    import fitz  # PyMuPDF
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for page in doc.pages(start, stop):
+            yield page.get_text("text")
+
+def _pdfplumber_pages(data, start, stop):
+    import pdfplumber
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text() or ""
+
+def _pypdf2_pages(data, start, stop):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(BytesIO(data))
+    for page in reader.pages[start:stop]:
+        yield page.extract_text() or ""
+
+_PAGE_READERS = {
+    "pymupdf": _pymupdf_pages,
+    "pdfplumber": _pdfplumber_pages,
+    "pypdf2": _pypdf2_pages,
+}
+
+
+def _env_key(bank):
+    return f"PDF_TEXT_BACKEND_{bank.upper()}"
+
+def backend_for(bank):
+    """Backend for a bank: PDF_TEXT_BACKEND_<BANK> overrides the default."""
+    backend = os.environ.get(_env_key(bank)) or DEFAULT_BACKENDS.get(bank, "pymupdf")
+    if backend not in _PAGE_READERS:
+        raise ValueError(f"Unknown PDF text backend '{backend}' for {bank}. Choose from {', '.join(BACKENDS)}.")
+    return backend
+
+def iter_page_texts(data, start=0, stop=None, backend="pymupdf"):
+    """Yield the text of each page in [start, stop) using the given backend."""
+    yield from _PAGE_READERS[backend](data, start, stop)
+
+@contextmanager
+def use_backend(bank, backend):
+    """Temporarily route a bank through another backend.
+
+    The choice travels through the environment, so page-range workers
+    started inside the block pick it up too.
+    """
+    key = _env_key(bank)
+    previous = os.environ.get(key)
+    os.environ[key] = backend
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = previous
+
+def _same_result(left, right):
+    if isinstance(left, pd.DataFrame) and isinstance(right, pd.DataFrame):
+        return left.reset_index(drop=True).equals(right.reset_index(drop=True))
+    return left == right
+
+def check_parity(bank, parse_fn, data, filename="uploaded.pdf", backends=BACKENDS):
+    """Parse one statement with every backend and compare against the bank's default.
+
+    Returns {backend: True/False or an error message}. A backend is safe to
+    adopt for a bank only if it is True on a representative set of statements.
+    """
+    reference_backend = DEFAULT_BACKENDS.get(bank, "pymupdf")
+    with use_backend(bank, reference_backend):
+        reference = parse_fn(data, filename)
+
+    report = {}
+    for backend in backends:
+        if backend == reference_backend:
+            report[backend] = True
+            continue
+        try:
+            with use_backend(bank, backend):
+                report[backend] = _same_result(reference, parse_fn(data, filename))
+        except Exception as e:
+            report[backend] = f"{type(e).__name__}: {e}"
+    return report
+
+
+if __name__ == "__main__":
+    # python -m shared.pdf_text <bank_module> <statement.pdf> [...]
+    import importlib
+
+    sys.path.append(os.path.abspath("pdf_app"))
+    bank_module = sys.argv[1]
+    parser = importlib.import_module(bank_module)
+    for path in sys.argv[2:]:
+        with open(path, "rb") as f:
+            outcome = check_parity(bank_module, parser.parse_file, f.read(), os.path.basename(path))
+        print(path)
+        for backend, status in outcome.items():
+            print(f"  {backend:<11} {'identical' if status is True else status if status else 'DIFFERENT'}")
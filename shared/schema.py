@@ -0,0 +1,115 @@
+import pandas as pd
+
+from shared.numeric import to_number
+
+# -------------------------------------
+# Canonical transaction schema shared by every bank parser
+# -------------------------------------
+
+CANONICAL_COLUMNS = [
+    "Bank", "Date", "Value Date", "Description", "Reference",
+    "Debit", "Credit", "Amount", "Balance",
+    "Currency", "Account Number", "IBAN", "Source File", "Categorization",
+]
+
+DESCRIPTION_COLUMN = "Description"
+
+DATE_COLUMNS = ("Date", "Value Date")
+AMOUNT_COLUMNS = ("Debit", "Credit", "Amount", "Balance")
+TEXT_COLUMNS = ("Description", "Reference")
+# Few distinct values repeated on every row
+CATEGORICAL_COLUMNS = ("Bank", "Currency", "Account Number", "IBAN", "Source File", "Categorization")
+
+# Amounts are kept as floats rounded to the statements' fixed two decimals
+AMOUNT_DECIMALS = 2
+
+# Parser column -> canonical column, per bank key of the registry; unlisted columns keep their name
+BANK_COLUMNS = {
+    "rak": {"Cheque": "Reference", "Withdrawal": "Debit", "Deposit": "Credit"},
+    "emirates_islamic": {"Transaction Date": "Date", "Narration": "Description", "Account Balance": "Balance"},
+    # Amount is the first figure printed on the line; the signed amount is the balance difference
+    "fab": {"Amount": "Statement Amount", "Extracted Amount": "Amount"},
+    "wio": {"Ref Number": "Reference"},
+    "adib": {"Transaction Date": "Date", "Narrative": "Description",
+             "Transaction Reference": "Reference", "Running Balance": "Balance"},
+    "adib2": {},
+    "mashreq": {},
+    "adcb": {"Posting Date": "Date", "Ref/Cheque No": "Reference", "Debit Amount": "Debit", "Credit Amount": "Credit"},
+    "al_jazira": {"Transaction Date": "Date", "Withdrawal (Dr)": "Debit", "Deposit (Cr)": "Credit",
+                  "Running Balance": "Balance"},
+}
+
+# Date layout printed by each bank; anything else is parsed day-first
+BANK_DATE_FORMATS = {
+    "rak": "%d-%b-%Y",
+    "emirates_islamic": "%d-%m-%Y",
+    "fab": "%d %b %Y",
+    "wio": "%d/%m/%Y",
+    "adib": "%d-%m-%Y",
+    "adib2": "%d-%m-%Y",
+    "mashreq": "%Y-%m-%d",
+}
+
+
+def _aliases():
+    # Renames that mean the same for every bank, for frames of unknown origin
+    aliases = {}
+    for columns in BANK_COLUMNS.values():
+        for source, target in columns.items():
+            if source not in CANONICAL_COLUMNS:
+                aliases.setdefault(source, target)
+    return aliases
+
+COLUMN_ALIASES = _aliases()
+
+
+def _dates(series, date_format=None):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    text = series.astype("string").str.strip()
+    parsed = pd.to_datetime(text, format=date_format, errors="coerce") if date_format else None
+    if parsed is None or parsed.isna().any():
+        fallback = pd.to_datetime(text, format="mixed", dayfirst=True, errors="coerce")
+        parsed = fallback if parsed is None else parsed.fillna(fallback)
+    return parsed
+
+def _amounts(series):
+    if not pd.api.types.is_numeric_dtype(series):
+        series = to_number(series.astype("string").str.strip())
+    return series.astype("float64").round(AMOUNT_DECIMALS)
+
+def to_canonical(df, bank=None):
+    """Rename a parser's columns to the canonical schema and give them compact, typed dtypes.
+
+    bank is the registry key of the parser that produced df. Canonical
+    columns come first in CANONICAL_COLUMNS order, followed by any columns
+    the schema has no place for. Amount is derived as Credit - Debit when
+    the statement has no amount of its own. Safe to apply to a frame that
+    is already canonical.
+    """
+    columns = BANK_COLUMNS.get(bank, COLUMN_ALIASES)
+    df = df.rename(columns={col: columns.get(col, col) for col in df.columns})
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    typed = {}
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            typed[col] = _dates(df[col], BANK_DATE_FORMATS.get(bank))
+    for col in AMOUNT_COLUMNS:
+        if col in df.columns:
+            typed[col] = _amounts(df[col])
+    if "Amount" not in typed and ("Debit" in typed or "Credit" in typed):
+        debit = typed.get("Debit", pd.Series(float("nan"), index=df.index))
+        credit = typed.get("Credit", pd.Series(float("nan"), index=df.index))
+        amount = credit.fillna(0) - debit.fillna(0)
+        typed["Amount"] = amount.where(debit.notna() | credit.notna()).round(AMOUNT_DECIMALS)
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            typed[col] = df[col].astype("string")
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            typed[col] = df[col].astype("string").astype("category")
+
+    df = df.assign(**typed)
+    ordered = [col for col in CANONICAL_COLUMNS if col in df.columns]
+    return df[ordered + [col for col in df.columns if col not in ordered]].reset_index(drop=True)
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+# -------------------------------------
+# Cold-start import timing
+# -------------------------------------
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Same search path as main.py
+APP_PATHS = [ROOT, os.path.join(ROOT, "pdf_app"), os.path.join(ROOT, "categorization_app")]
+
+DEFAULT_MODULES = [
+    "App", "categorizer", "banks",
+    "Rak_Bank", "emirates_islamic_bank", "fab_bank", "Wio_bank", "adib_bank",
+    "Adib2", "mashreq", "adcb", "al_jazira_bank",
+]
+
+_SNIPPET = "import sys, time; sys.path[:0] = {paths!r}; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_time(module, repeat=3):
+    """Best-of-repeat seconds a fresh interpreter spends importing module."""
+    code = _SNIPPET.format(paths=APP_PATHS, module=module)
+    timings = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"import {module} failed")
+        timings.append(float(completed.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+def startup_report(modules=DEFAULT_MODULES, repeat=3):
+    """{module: seconds or error message} for each module, each measured in a clean process."""
+    report = {}
+    for module in modules:
+        try:
+            report[module] = import_time(module, repeat)
+        except RuntimeError as e:
+            report[module] = str(e)
+    return report
+
+
+if __name__ == "__main__":
+    # python -m shared.startup [module ...]
+    for module, outcome in startup_report(sys.argv[1:] or DEFAULT_MODULES).items():
+        print(f"{module:<24} {f'{outcome * 1000:8.1f} ms' if isinstance(outcome, float) else outcome}")
@@ -0,0 +1,94 @@
+import os
+from itertools import islice
+
+import pandas as pd
+
+# -------------------------------------
+# Bounded-memory streaming of transaction records
+# -------------------------------------
+
+# Transactions per DataFrame chunk when streaming a statement
+STREAM_CHUNK_ROWS = int(os.environ.get("PDF_STREAM_CHUNK_ROWS", "5000"))
+
+
+def batched(iterable, size=STREAM_CHUNK_ROWS):
+    """Yield lists of at most size items from any iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def write_csv_chunks(frames, output_path):
+    """Append DataFrame chunks to a CSV file as they arrive; returns the row count.
+
+    Only one chunk is held in memory at a time. Later chunks are aligned to
+    the columns of the first one, and the file only appears under its final
+    name once every chunk has been written.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    columns = None
+    rows = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            for frame in frames:
+                if columns is None:
+                    columns = list(frame.columns)
+                    frame.to_csv(f, index=False)
+                else:
+                    frame.reindex(columns=columns).to_csv(f, index=False, header=False)
+                rows += len(frame)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+# Rows per worksheet in the xlsx format
+XLSX_MAX_ROWS = 1048576
+
+def _cell(value):
+    # openpyxl cannot store NaN / NaT / NA
+    return None if pd.isna(value) else value
+
+def write_xlsx_chunks(frames, output_path, sheet_name="Sheet1"):
+    """Write DataFrame chunks to an xlsx file with openpyxl's write-only mode; returns the row count.
+
+    Rows are streamed to disk as they arrive. Output that does not fit one
+    worksheet continues on numbered extra sheets with the same header.
+    """
+    from openpyxl import Workbook
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    workbook = Workbook(write_only=True)
+    sheet = None
+    columns = None
+    sheet_rows = 0
+    rows = 0
+    try:
+        for frame in frames:
+            if columns is None:
+                columns = list(frame.columns)
+            else:
+                frame = frame.reindex(columns=columns)
+            for values in frame.itertuples(index=False, name=None):
+                if sheet is None or sheet_rows >= XLSX_MAX_ROWS:
+                    sheet = workbook.create_sheet(sheet_name if sheet is None else f"{sheet_name} ({len(workbook.worksheets) + 1})")
+                    sheet.append([str(col) for col in columns])
+                    sheet_rows = 1
+                sheet.append([_cell(value) for value in values])
+                sheet_rows += 1
+                rows += 1
+        if sheet is None:
+            sheet = workbook.create_sheet(sheet_name)
+            if columns is not None:
+                sheet.append([str(col) for col in columns])
+        workbook.save(tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
@@ -0,0 +1,237 @@
+import os
+import re
+from bisect import bisect
+from statistics import median
+
+from shared.normalize import normalize_text
+
+# -------------------------------------
+# Crop-region table extraction for pdfplumber parsers
+# -------------------------------------
+
+# Extract only the learned transaction-table region with explicit column lines.
+# Opt-in (PDF_TABLE_CROP=1) until it is checked against real statements for row loss.
+CROP_ENABLED = os.environ.get("PDF_TABLE_CROP", "0").lower() in ("1", "true", "yes")
+
+# Pages searched for the header row when learning the layout
+LEARN_PAGES = 3
+
+# Vertical tolerance (points) for header labels to count as one header row
+HEADER_ROW_TOLERANCE = 12
+
+# Room (points) left around the header labels, amounts often stick out past their column title
+COLUMN_MARGIN = 24
+
+# A row starting with a date begins a transaction; other rows continue the one above
+DATE_ANCHOR = re.compile(r"^\d{1,4}[-/. ]\w{2,9}[-/. ]\d{2,4}")
+
+# Words whose tops are this close (points) are on one text line
+LINE_TOLERANCE = 3
+
+# Gap between words of one column title, in text heights
+TITLE_GAP = 0.8
+
+# Lines at most this many header-text heights below the previous one continue its wrapped cells
+CONTINUATION_LINES = 1.5
+
+# Undated lines further below the previous one than this many text heights are outside the table
+ROW_LINES = 3.0
+
+
+def _label_pattern(label):
+    return r"\s+".join(re.escape(word) for word in label.split())
+
+def _text(cell):
+    return " ".join(normalize_text(cell or "").split())
+
+
+class TableLayout:
+    """Horizontal extent and column boundaries of a transaction table, learned from its header row."""
+
+    def __init__(self, x0, x1, column_lines, line_height, titles):
+        self.x0 = x0
+        self.x1 = x1
+        self.column_lines = column_lines
+        self.line_height = line_height
+        self.titles = titles
+
+
+class TableRegion:
+    """Transaction-table bounding box and column x-positions for one statement.
+
+    The layout is learned once, from the first page of the document whose
+    header row holds every printed label in headers: the table spans the
+    header labels, and columns split on the vertical rule between
+    neighbouring header titles, or halfway between them when the table is
+    not ruled (unlisted titles on that row become columns too). Every page is
+    then cropped to that span and its words are placed into those columns
+    line by line, so pdfplumber runs neither line nor edge detection nor
+    its table finder, and never searches a later page for the header again.
+
+    Text lines are stitched back into table rows: a row whose first cell
+    matches anchor (a date by default), or that repeats the header, starts
+    a new row; lines right below it with an empty last column continue its
+    cells, as wrapped cells of a ruled table do; other undated lines close
+    to the table with two or more cells are rows of their own (opening and
+    closing balances). Anything else is page furniture and is dropped.
+    Statements whose header is not found, or pages where the cropped table
+    comes back empty, use the bank's usual full-page extraction.
+    """
+
+    def __init__(self, headers, min_columns=None, anchor=DATE_ANCHOR, footer_margin=0, enabled=None):
+        self.headers = list(headers)
+        self.min_columns = min_columns or len(self.headers)
+        self.anchor = anchor
+        self.footer_margin = footer_margin
+        self.enabled = CROP_ENABLED if enabled is None else enabled
+        self.layout = None
+        self._learned = False
+
+    # ---------- Learning ----------
+
+    def _header_rows(self, page):
+        """Word boxes of each row holding every header label, top to bottom."""
+        matches = [page.search(_label_pattern(label), regex=True, case=False) for label in self.headers]
+        if not all(matches):
+            return
+        # Labels such as "Date" also occur above the table; only rows where every label lines up count
+        for anchor in sorted(matches[0], key=lambda match: match["top"]):
+            boxes = [anchor]
+            for found in matches[1:]:
+                same_row = [match for match in found if abs(match["top"] - anchor["top"]) <= HEADER_ROW_TOLERANCE]
+                if not same_row:
+                    break
+                boxes.append(min(same_row, key=lambda match: abs(match["top"] - anchor["top"])))
+            else:
+                yield boxes
+
+    def _column_boxes(self, page, labels):
+        """Boxes of every column title on the header row: the given labels plus the other titles on that row."""
+        line_height = median(box["bottom"] - box["top"] for box in labels)
+        top = min(box["top"] for box in labels) - HEADER_ROW_TOLERANCE
+        bottom = max(box["bottom"] for box in labels) + HEADER_ROW_TOLERANCE
+        covered = [(box["x0"], box["x1"]) for box in labels]
+        items = [{"x0": box["x0"], "x1": box["x1"], "text": box["text"], "label": True} for box in labels]
+        items += [{"x0": word["x0"], "x1": word["x1"], "text": word["text"], "label": False}
+                  for word in page.extract_words()
+                  if word["top"] >= top and word["bottom"] <= bottom
+                  and not any(x0 - 1 <= word["x0"] and word["x1"] <= x1 + 1 for x0, x1 in covered)]
+
+        # Words closer than TITLE_GAP text heights belong to one title; two listed labels never merge
+        boxes = []
+        for item in sorted(items, key=lambda item: item["x0"]):
+            last = boxes[-1] if boxes else None
+            if (last is not None and item["x0"] - last["x1"] <= TITLE_GAP * line_height
+                    and not (item["label"] and last["label"])):
+                boxes[-1] = {"x0": last["x0"], "x1": max(last["x1"], item["x1"]),
+                             "text": f"{last['text']} {item['text']}", "label": last["label"] or item["label"]}
+            else:
+                boxes.append(item)
+        return boxes, line_height
+
+    def _learn_from(self, page):
+        for labels in self._header_rows(page):
+            boxes, line_height = self._column_boxes(page, labels)
+            if len(boxes) < self.min_columns:
+                continue
+            rules = self._header_rules(page, labels)
+            x0 = max(page.bbox[0], boxes[0]["x0"] - COLUMN_MARGIN)
+            x1 = min(page.bbox[2], boxes[-1]["x1"] + COLUMN_MARGIN)
+            outer = [x for x in rules if x0 <= x <= boxes[0]["x0"]]
+            x0 = max(outer) - 1 if outer else x0
+            outer = [x for x in rules if boxes[-1]["x1"] <= x <= x1]
+            x1 = min(outer) + 1 if outer else x1
+            # Ruled tables split columns on the rule between two titles, others halfway between them
+            inner = []
+            for left, right in zip(boxes, boxes[1:]):
+                middle = (left["x1"] + right["x0"]) / 2
+                between = [x for x in rules if left["x1"] <= x <= right["x0"]]
+                inner.append(min(between, key=lambda x: abs(x - middle)) if between else middle)
+            return TableLayout(x0, x1, [x0] + inner + [x1], line_height, [box["text"] for box in boxes])
+        return None
+
+    def _header_rules(self, page, labels):
+        """x-positions of the vertical rules crossing the header row, if the table is ruled."""
+        middle = sum((box["top"] + box["bottom"]) / 2 for box in labels) / len(labels)
+        return sorted({round(edge["x0"], 1) for edge in page.edges
+                       if edge["orientation"] == "v" and edge["top"] <= middle <= edge["bottom"]})
+
+    def learn(self, pdf):
+        """Learn the table layout from the first pages of the document, once; None if no header row is found."""
+        if not self._learned:
+            self._learned = True
+            for page in pdf.pages[:LEARN_PAGES]:
+                self.layout = self._learn_from(page)
+                if self.layout is not None:
+                    break
+        return self.layout
+
+    # ---------- Extraction ----------
+
+    def _starts_row(self, row):
+        if self.anchor.match(_text(row[0])):
+            return True
+        cells = " ".join(_text(cell) for cell in row).lower()
+        return all(label.lower() in cells for label in self.headers)
+
+    def _lines(self, page):
+        """(top, cells) for each text line of the table region, words placed in columns by their centre."""
+        layout = self.layout
+        region = page.crop((layout.x0, page.bbox[1], layout.x1, page.bbox[3] - self.footer_margin))
+        lines = []
+        for word in sorted(region.extract_words(), key=lambda word: (word["top"], word["x0"])):
+            if not lines or word["top"] - lines[-1][0] > LINE_TOLERANCE:
+                lines.append((word["top"], [[] for _ in layout.column_lines[1:]]))
+            centre = (word["x0"] + word["x1"]) / 2
+            column = min(max(bisect(layout.column_lines, centre) - 1, 0), len(lines[-1][1]) - 1)
+            lines[-1][1][column].append(word)
+        return [(top, [" ".join(word["text"] for word in sorted(cell, key=lambda word: word["x0"])) for cell in cells])
+                for top, cells in lines]
+
+    def _stitch(self, lines):
+        """Table rows from the text lines of the table region, see the class docstring."""
+        line_height = self.layout.line_height
+        rows = []
+        previous_top = None
+        in_table = False
+        after_header = False
+        for top, cells in lines:
+            gap = top - previous_top if previous_top is not None else None
+            previous_top = top
+            filled = [bool(_text(cell)) for cell in cells]
+            if self._starts_row(cells):
+                rows.append(list(cells))
+                in_table = True
+                after_header = self.anchor.match(_text(cells[0])) is None
+            elif not in_table or not any(filled) or gap > ROW_LINES * line_height:
+                # Page furniture above, below or beside the table
+                in_table = False
+            elif not after_header and not filled[-1] and gap <= CONTINUATION_LINES * line_height:
+                # Wrapped cells of the row above; the last (balance) column never wraps
+                last = rows[-1]
+                for i, cell in enumerate(cells):
+                    if cell:
+                        last[i] = f"{last[i]}\n{cell}" if last[i] else cell
+            elif sum(filled) >= 2:
+                # Undated table row, such as an opening or closing balance
+                rows.append(list(cells))
+                after_header = False
+            else:
+                in_table = False
+        return rows
+
+    def _cropped_table(self, page):
+        """Rows from the learned region of this page, or None to fall back to full-page extraction."""
+        if self.learn(page.pdf) is None:
+            return None
+        return self._stitch(self._lines(page)) or None
+
+    def extract_tables(self, page):
+        """Drop-in replacement for page.extract_tables()."""
+        table = self._cropped_table(page) if self.enabled else None
+        return [table] if table else page.extract_tables()
+
+    def extract_table(self, page):
+        """Drop-in replacement for page.extract_table()."""
+        table = self._cropped_table(page) if self.enabled else None
+        return table if table else page.extract_table()
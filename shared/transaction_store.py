@@ -0,0 +1,225 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from shared.core import clean_text
+from shared.normalize import normalize_series
+from shared.schema import to_canonical
+
+# -------------------------------------
+# Local database of normalized transactions across uploads
+# -------------------------------------
+
+STORE_PATH = os.environ.get("TRANSACTION_STORE_PATH", "shared/cache/transactions.sqlite")
+
+# Stored field -> canonical column(s) it is taken from, first present one wins
+FIELD_COLUMNS = {
+    "bank": ["Bank"],
+    "account": ["IBAN", "Account Number"],
+    "date": ["Date"],
+    "value_date": ["Value Date"],
+    "description": ["Description"],
+    "reference": ["Reference"],
+    "debit": ["Debit"],
+    "credit": ["Credit"],
+    "amount": ["Amount"],
+    "balance": ["Balance"],
+    "currency": ["Currency"],
+    "category": ["Categorization"],
+    "source_file": ["Source File"],
+}
+
+STORE_COLUMNS = list(FIELD_COLUMNS)
+DATE_FIELDS = ("date", "value_date")
+NUMBER_FIELDS = ("debit", "credit", "amount", "balance")
+
+# Fields a row's fingerprint is built from. Amounts derived from balance
+# differences depend on what else was uploaded, so they are left out.
+FINGERPRINT_FIELDS = ("bank", "account", "date", "description", "reference", "debit", "credit", "balance")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    bank TEXT,
+    account TEXT,
+    date TEXT,
+    value_date TEXT,
+    description TEXT,
+    reference TEXT,
+    debit REAL,
+    credit REAL,
+    amount REAL,
+    balance REAL,
+    currency TEXT,
+    category TEXT,
+    source_file TEXT,
+    description_key TEXT,
+    imported_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_account_date ON transactions (account, date);
+CREATE INDEX IF NOT EXISTS transactions_description_key ON transactions (description_key);
+CREATE INDEX IF NOT EXISTS transactions_uncategorized ON transactions (description_key) WHERE category IS NULL;
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_balance ON transactions (balance);
+"""
+
+
+def _text(series):
+    """Stripped text with collapsed whitespace; blanks become None."""
+    text = normalize_series(series.astype(object))
+    text = text.map(lambda value: " ".join(str(value).split()) if pd.notna(value) else None)
+    return text.where(text != "", None)
+
+def normalize_transactions(df, bank=None):
+    """Map a canonical transaction frame onto the stored fields; bank fills in when there is no Bank column."""
+    canonical = to_canonical(df)
+    normalized = pd.DataFrame(index=canonical.index)
+    for field, candidates in FIELD_COLUMNS.items():
+        present = [canonical[col] for col in candidates if col in canonical.columns]
+        if not present:
+            normalized[field] = None
+        elif field in DATE_FIELDS:
+            # ISO dates sort and compare correctly as text
+            dates = present[0]
+            normalized[field] = dates.dt.strftime("%Y-%m-%d").astype(object).where(dates.notna(), None)
+        elif field in NUMBER_FIELDS:
+            normalized[field] = present[0].astype(float)
+        else:
+            text = _text(present[0])
+            for other in present[1:]:
+                text = text.fillna(_text(other))
+            normalized[field] = text
+
+    if bank is not None:
+        normalized["bank"] = normalized["bank"].fillna(bank)
+    return normalized.reset_index(drop=True)
+
+def _key_part(value):
+    if value is None or value != value:
+        return ""
+    return f"{value:.2f}" if isinstance(value, float) else str(value).casefold()
+
+def fingerprints(normalized, seen=None):
+    """Content fingerprint of each normalized row.
+
+    Identical rows within one upload (same day, text and amounts) are told
+    apart by their occurrence number, so re-uploading an overlapping
+    statement maps each of them onto the copy already stored. When an
+    upload arrives in chunks, pass the same seen dict for every chunk so
+    occurrences keep counting across them. Rows without an account are
+    scoped by their source file instead.
+    """
+    fields = normalized[list(FINGERPRINT_FIELDS)].copy()
+    # Statements without an account (FAB) cannot be told apart by account, so
+    # their rows are only deduplicated against re-uploads of the same file
+    fields["account"] = fields["account"].fillna("file:" + normalized["source_file"].fillna(""))
+    keys = pd.Series(
+        ["\x1f".join(_key_part(value) for value in row) for row in fields.itertuples(index=False, name=None)],
+        index=normalized.index,
+    )
+    occurrence = keys.groupby(keys, sort=False).cumcount()
+    if seen is not None:
+        occurrence = occurrence + keys.map(lambda key: seen.get(key, 0))
+        for key, count in keys.value_counts().items():
+            seen[key] = seen.get(key, 0) + count
+    return [hashlib.sha256(f"{key}\x1e{n}".encode("utf-8")).hexdigest() for key, n in zip(keys, occurrence)]
+
+
+class TransactionStore:
+    """SQLite store of transactions from every upload, deduplicated by row fingerprint.
+
+    Statements with overlapping periods can be added repeatedly: rows already
+    stored are skipped by the fingerprint's unique index, and past
+    transactions are queried from the store instead of re-parsing PDFs.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def add(self, df, bank=None, seen=None):
+        """Insert the rows of a parser DataFrame that are not stored yet; returns (inserted, duplicates).
+
+        seen carries occurrence counts between chunks of one upload, see fingerprints().
+        """
+        if df is None or df.empty:
+            return 0, 0
+        normalized = normalize_transactions(df, bank)
+        normalized.insert(0, "fingerprint", fingerprints(normalized, seen))
+        # Cleaned description, as the category archive keys it
+        normalized["description_key"] = normalized["description"].map(lambda text: None if text is None else clean_text(text))
+        normalized["imported_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        rows = [tuple(None if value != value else value for value in row)
+                for row in normalized.itertuples(index=False, name=None)]
+
+        columns = ", ".join(normalized.columns)
+        placeholders = ", ".join("?" * len(normalized.columns))
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(f"INSERT OR IGNORE INTO transactions ({columns}) VALUES ({placeholders})", rows)
+            inserted = self._conn.total_changes - before
+        return inserted, len(rows) - inserted
+
+    def query(self, account=None, bank=None, start=None, end=None, balance=None):
+        """Stored transactions in date order, filtered by any of account, bank, date range (ISO) and balance."""
+        conditions, params = [], []
+        for clause, value in (("account = ?", account), ("bank = ?", bank), ("date >= ?", start),
+                              ("date <= ?", end), ("balance = ?", balance)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return pd.read_sql_query(
+            f"SELECT {', '.join(STORE_COLUMNS)} FROM transactions {where} ORDER BY date, id",
+            self._conn, params=params,
+        )
+
+    def uncategorized_keys(self):
+        """Cleaned descriptions of stored transactions that have no category yet."""
+        return [row[0] for row in self._conn.execute(
+            "SELECT DISTINCT description_key FROM transactions WHERE category IS NULL AND description_key IS NOT NULL"
+        )]
+
+    def set_categories(self, categories, missing_only=False):
+        """Set the category of stored transactions from {cleaned description: category}; returns rows changed.
+
+        With missing_only, transactions that already have a category keep it.
+        """
+        condition = "category IS NULL" if missing_only else "category IS NOT ?"
+        rows = [(category, key) if missing_only else (category, key, category)
+                for key, category in categories.items() if category is not None]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(f"UPDATE transactions SET category = ? WHERE description_key = ? AND {condition}", rows)
+            return self._conn.total_changes - before
+
+    def accounts(self):
+        """(bank, account, transactions, first date, last date) for everything stored."""
+        return self._conn.execute(
+            """SELECT bank, account, COUNT(*), MIN(date), MAX(date) FROM transactions
+               GROUP BY bank, account ORDER BY bank, account"""
+        ).fetchall()
+
+
+if __name__ == "__main__":
+    # python -m shared.transaction_store: summary of what is stored
+    store = TransactionStore()
+    for bank, account, count, first, last in store.accounts():
+        print(f"{bank or '-':<24} {account or '-':<28} {count:>7} transactions  {first} .. {last}")
+    print(f"{len(store)} transactions in {store.path}")